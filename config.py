@@ -9,8 +9,7 @@ IMAGES_DIR = PROJECT_ROOT / "Images"
 RESULTS_DIR = PROJECT_ROOT / "results"
 SRC_DIR = PROJECT_ROOT / "src"
 
-# Create results directory if it doesn't exist
-RESULTS_DIR.mkdir(exist_ok=True)
+# Importing config creates nothing; RESULTS_DIR is made when first written to.
 
 # Image processing parameters
 DEFAULT_GAMMA_BRIGHT = [0.6, 0.4, 0.3]
@@ -35,6 +34,24 @@ SOBEL_Y_KERNEL = [[-1, -2, -1],
                   [0, 0, 0],
                   [1, 2, 1]]
 
+# Separable factors: SOBEL_X = outer(SOBEL_SMOOTH_1D, SOBEL_DERIVATIVE_1D),
+# SOBEL_Y = outer(SOBEL_DERIVATIVE_1D, SOBEL_SMOOTH_1D)
+SOBEL_SMOOTH_1D = [1, 2, 1]
+SOBEL_DERIVATIVE_1D = [-1, 0, 1]
+
+# Result cache
+CACHE_DIR = RESULTS_DIR / "cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+IMAGE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+SPECTRUM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Benchmarks
+BENCHMARK_DIR = RESULTS_DIR / "benchmarks"
+BENCHMARK_SIZES = [256, 512, 1024, 2048, 4096, 8192]
+BENCHMARK_KERNEL_SIZES = [3, 5, 15, 31]
+BENCHMARK_DTYPES = ['uint8', 'float32']
+BENCHMARK_REGRESSION_THRESHOLD = 0.10
+
 # Display settings
 FIGURE_SIZE_COMPARISON = (12, 5)
 FIGURE_SIZE_GRID_2x4 = (16, 8)
@@ -1,3 +1,6 @@
+import argparse
+from contextlib import nullcontext
+
 import numpy as np
 
 from config import (
@@ -20,9 +23,13 @@ from src.histogram import (
 
 from src.filters import (
     box_filter, gaussian_filter, laplacian_filter, sharpen_with_laplacian,
-    sobel_gradient, unsharp_masking, mixed_spatial_enhancement
+    sobel_gradient, unsharp_mask, add_mask, mixed_spatial_enhancement
 )
 
+from src.pipeline import Pipeline
+from src.profiling import Profiler
+from src.writer import headless
+
 
 def task_1_image_negatives():
     print("\n" + "="*60)
@@ -238,8 +245,19 @@ def task_9_unsharp_masking():
     
     img = load_image('Fig0340(a)(dipxe_text).jpg')
     
-    blurred, mask, result_k1 = unsharp_masking(img, blur_size=5, k=1.0)
-    _, _, result_k45 = unsharp_masking(img, blur_size=5, k=4.5)
+    # Both results share one blur and one mask.
+    graph = Pipeline()
+    original = graph.input('img')
+    blurred = graph.add(box_filter, original, 5)
+    mask = graph.add(unsharp_mask, original, blurred)
+    outputs = graph.run({'img': img}, {
+        'blurred': blurred,
+        'mask': mask,
+        'k1': graph.add(add_mask, original, mask, k=1.0),
+        'k45': graph.add(add_mask, original, mask, k=4.5),
+    })
+    blurred, mask = outputs['blurred'], outputs['mask']
+    result_k1, result_k45 = outputs['k1'], outputs['k45']
     
     mask_display = normalize_for_display(mask)
     
@@ -306,7 +324,20 @@ def task_10_mixed_spatial_enhancement():
     print("✓ Task 10 completed")
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Chapter 3 tasks.")
+    parser.add_argument('--profile', action='store_true',
+                        help="time every src call and print a summary per task and function")
+    parser.add_argument('--profile-json', metavar='PATH', help="also save the profile as JSON")
+    parser.add_argument('--trace', metavar='PATH', help="also save a Chrome trace of the profile")
+    parser.add_argument('--headless', action='store_true',
+                        help="never open windows; write images and figures in the background")
+    parser.add_argument('--no-figures', action='store_true',
+                        help="headless, and skip the comparison figures: only write result images")
+    parser.add_argument('--writers', type=int, default=2, help="background writer workers")
+    args = parser.parse_args(argv)
+    profiler = Profiler() if args.profile or args.profile_json or args.trace else None
+    
     print("\n" + "="*60)
     print("Intensity Transformations and Spatial Filtering")
     print("="*60)
@@ -326,17 +357,32 @@ def main():
         task_10_mixed_spatial_enhancement
     ]
     
-    for task in tasks:
-        try:
-            task()
-        except Exception as e:
-            print(f"\n✗ Error in {task.__name__}: {str(e)}")
-            continue
+    output = (headless(args.writers, figures=not args.no_figures)
+              if args.headless or args.no_figures else nullcontext())
+    with output:
+        for task in tasks:
+            try:
+                with profiler.run(task.__name__) if profiler else nullcontext():
+                    task()
+            except Exception as e:
+                print(f"\n✗ Error in {task.__name__}: {str(e)}")
+                continue
     
     print("\n" + "="*60)
     print("ALL TASKS COMPLETED!")
     print(f"Check the '{RESULTS_DIR.name}' folder for all results.")
     print("="*60 + "\n")
+    
+    if profiler:
+        print(profiler.table(by='run'))
+        print()
+        print(profiler.table(limit=20))
+        if args.profile_json:
+            profiler.to_json(args.profile_json)
+            print(f"\nProfile saved to {args.profile_json}")
+        if args.trace:
+            profiler.to_chrome_trace(args.trace)
+            print(f"Chrome trace saved to {args.trace} (open in chrome://tracing)")
 
 
 if __name__ == "__main__":
@@ -2,75 +2,194 @@
 Digital Image Processing - Source Package
 Contains modules for image transformations, histogram processing, and filtering.
 """
+import importlib
+import sys
+from pathlib import Path
 
-from .transformations import (
-    image_negative,
-    log_transformation,
-    gamma_correction,
-    bit_plane_slicing,
-    contrast_stretching
-)
+# config.py sits next to the package; make it importable however src is
+# reached (python main.py, python -m src.cli, or from another directory).
+_ROOT = str(Path(__file__).parent.parent)
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)
 
-from .histogram import (
-    calculate_histogram,
-    histogram_equalization,
-    local_histogram_equalization,
-    histogram_matching,
-    adaptive_histogram_equalization
-)
-
-from .filters import (
-    box_filter,
-    gaussian_filter,
-    median_filter,
-    laplacian_filter,
-    sharpen_with_laplacian,
-    sobel_gradient,
-    unsharp_masking,
-    high_boost_filter,
-    mixed_spatial_enhancement
-)
-
-from .utils import (
-    load_image,
-    save_image,
-    show_comparison,
-    show_multiple_images,
-    normalize_for_display,
-    apply_convolution
-)
-
-__all__ = [
+# Public names by submodule. Submodules are imported on first use of one of
+# their names, so `import src` is cheap and cv2/matplotlib are only loaded by
+# the functions that need them.
+_MODULES = {
     # Transformations
-    'image_negative',
-    'log_transformation',
-    'gamma_correction',
-    'bit_plane_slicing',
-    'contrast_stretching',
+    'transformations': [
+        'image_negative',
+        'log_transformation',
+        'gamma_correction',
+        'bit_plane_slicing',
+        'contrast_stretching',
+        'negative_lut',
+        'log_lut',
+        'gamma_lut',
+        'contrast_stretching_lut',
+    ],
     
     # Histogram
-    'calculate_histogram',
-    'histogram_equalization',
-    'local_histogram_equalization',
-    'histogram_matching',
-    'adaptive_histogram_equalization',
+    'histogram': [
+        'calculate_histogram',
+        'histogram_equalization',
+        'local_histogram_equalization',
+        'histogram_matching',
+        'adaptive_histogram_equalization',
+        'equalization_lut',
+        'matching_lut',
+    ],
     
     # Filters
-    'box_filter',
-    'gaussian_filter',
-    'median_filter',
-    'laplacian_filter',
-    'sharpen_with_laplacian',
-    'sobel_gradient',
-    'unsharp_masking',
-    'high_boost_filter',
-    'mixed_spatial_enhancement',
+    'filters': [
+        'box_kernel_1d',
+        'integral_image',
+        'box_sum',
+        'box_filter',
+        'gaussian_kernel',
+        'gaussian_kernel_1d',
+        'gaussian_filter',
+        'median_filter',
+        'laplacian_filter',
+        'sharpen_with_laplacian',
+        'sobel_gradient',
+        'image_derivatives',
+        'unsharp_mask',
+        'add_mask',
+        'unsharp_masking',
+        'high_boost_filter',
+        'mixed_spatial_enhancement',
+    ],
+    
+    # Kernels
+    'kernels': [
+        'Kernel',
+        'get_kernel',
+        'kernel_bank_info',
+        'clear_kernel_bank',
+    ],
+    
+    # Point operations
+    'point_ops': [
+        'PointOp',
+        'PointChain',
+        'lut_op',
+        'negative_op',
+        'log_op',
+        'gamma_op',
+        'contrast_stretching_op',
+        'equalization_op',
+        'matching_op',
+    ],
+    
+    # Pipeline
+    'pipeline': [
+        'Pipeline',
+        'Node',
+    ],
+    
+    # Cache
+    'cache': [
+        'ResultCache',
+        'result_key',
+        'cached',
+        'cache_stats',
+        'enable_disk_cache',
+        'default_cache',
+    ],
+    
+    # Batch
+    'batch': [
+        'as_stack',
+        'apply_lut_stack',
+        'calculate_histogram_batch',
+        'image_negative_batch',
+        'log_transformation_batch',
+        'gamma_correction_batch',
+        'contrast_stretching_batch',
+        'histogram_equalization_batch',
+        'apply_convolution_batch',
+        'box_filter_batch',
+        'gaussian_filter_batch',
+        'median_filter_batch',
+        'laplacian_filter_batch',
+        'sobel_gradient_batch',
+        'local_histogram_equalization_batch',
+    ],
+    
+    # Streaming
+    'streaming': [
+        'open_image_source',
+        'open_image_sink',
+        'read_strips',
+        'stream_stage',
+        'stream_pipeline',
+        'stream_filter',
+    ],
+    
+    # Borders
+    'borders': [
+        'BORDER_MODES',
+        'border_index',
+        'pad_border',
+    ],
+    
+    # Workspace
+    'workspace': [
+        'Workspace',
+    ],
+    
+    # Profiling
+    'profiling': [
+        'Profiler',
+        'profile',
+        'profiled',
+    ],
+    
+    # Writer
+    'writer': [
+        'ResultWriter',
+        'headless',
+    ],
+    
+    # Shared memory
+    'shared': [
+        'SharedArray',
+        'SharedImageStore',
+        'attached',
+        'share',
+    ],
     
     # Utils
-    'load_image',
-    'save_image',
-    'show_comparison',
-    'show_multiple_images',
-    'normalize_for_display',
-    'apply_convolution'
-]
+    'utils': [
+        'load_image',
+        'save_image',
+        'show_comparison',
+        'show_multiple_images',
+        'normalize_for_display',
+        'apply_convolution',
+        'apply_separable_convolution',
+        'correlate_padded',
+        'correlate_bordered',
+        'apply_fft_convolution',
+        'plan_convolution',
+        'separate_kernel',
+    ],
+}
+
+_EXPORTS = {name: module for module, names in _MODULES.items() for name in names}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
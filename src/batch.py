@@ -0,0 +1,125 @@
+import numpy as np
+from src.transformations import (
+    image_negative, log_transformation, gamma_correction, contrast_stretching,
+    negative_lut, log_lut, gamma_lut, contrast_stretching_lut,
+    default_log_constant, default_stretch_points
+)
+from src.histogram import (
+    calculate_histogram, equalization_lut, percentile_from_histogram,
+    local_histogram_equalization
+)
+from src.filters import (
+    box_filter, gaussian_filter, median_filter, laplacian_filter, sobel_gradient
+)
+from src.utils import apply_convolution
+
+
+def as_stack(frames):
+    stack = np.asarray(frames)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    if stack.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) stack, got shape {stack.shape}")
+    return stack
+
+
+def apply_lut_stack(stack, luts):
+    stack = as_stack(stack)
+    luts = np.asarray(luts, dtype=np.uint8)
+    if luts.ndim == 1:
+        return luts[stack]
+    
+    # One table per frame: offset every frame into its own block of 256.
+    index = stack.astype(np.int32)
+    index += (np.arange(len(stack), dtype=np.int32) * 256)[:, None, None]
+    return luts.ravel()[index]
+
+
+def calculate_histogram_batch(stack):
+    stack = as_stack(stack)
+    return np.stack([calculate_histogram(frame) for frame in stack])
+
+
+def image_negative_batch(stack):
+    stack = as_stack(stack)
+    if stack.dtype == np.uint8:
+        return negative_lut()[stack]
+    return image_negative(stack)
+
+
+def log_transformation_batch(stack, c=None):
+    stack = as_stack(stack)
+    if stack.dtype != np.uint8:
+        return np.stack([log_transformation(frame, c) for frame in stack])
+    
+    if c is not None:
+        return log_lut(c)[stack]
+    
+    luts = np.stack([log_lut(default_log_constant(peak)) for peak in stack.max(axis=(1, 2))])
+    return apply_lut_stack(stack, luts)
+
+
+def gamma_correction_batch(stack, gamma=1.0):
+    stack = as_stack(stack)
+    if stack.dtype == np.uint8:
+        return gamma_lut(float(gamma))[stack]
+    return gamma_correction(stack, gamma)
+
+
+def contrast_stretching_batch(stack, r1=None, s1=None, r2=None, s2=None):
+    stack = as_stack(stack)
+    if stack.dtype != np.uint8:
+        return np.stack([contrast_stretching(frame, r1, s1, r2, s2) for frame in stack])
+    
+    if r1 is not None and r2 is not None:
+        return contrast_stretching_lut(*default_stretch_points(None, r1, s1, r2, s2))[stack]
+    
+    luts = []
+    for hist in calculate_histogram_batch(stack):
+        low = percentile_from_histogram(hist, 5)
+        high = percentile_from_histogram(hist, 95)
+        luts.append(contrast_stretching_lut(*default_stretch_points(None, low, s1, high, s2)))
+    return apply_lut_stack(stack, np.stack(luts))
+
+
+def histogram_equalization_batch(stack, mode='frame'):
+    stack = as_stack(stack)
+    hists = calculate_histogram_batch(stack)
+    
+    if mode == 'frame':
+        luts = np.stack([equalization_lut(hist) for hist in hists])
+        return apply_lut_stack(stack, luts), hists, hists.cumsum(axis=1)
+    
+    if mode == 'stack':
+        hist = hists.sum(axis=0)
+        return equalization_lut(hist)[stack], hist, hist.cumsum()
+    
+    raise ValueError(f"Unknown equalization mode: {mode}")
+
+
+def apply_convolution_batch(stack, kernel, method='auto'):
+    return apply_convolution(as_stack(stack), kernel, method)
+
+
+def box_filter_batch(stack, size, method='auto'):
+    return box_filter(as_stack(stack), size, method)
+
+
+def gaussian_filter_batch(stack, size, sigma):
+    return gaussian_filter(as_stack(stack), size, sigma)
+
+
+def median_filter_batch(stack, size=3, method='auto'):
+    return median_filter(as_stack(stack), size, method)
+
+
+def laplacian_filter_batch(stack, kernel=None):
+    return laplacian_filter(as_stack(stack), kernel)
+
+
+def sobel_gradient_batch(stack, l1=False):
+    return sobel_gradient(as_stack(stack), l1)
+
+
+def local_histogram_equalization_batch(stack, window_size=3, method='auto'):
+    return local_histogram_equalization(as_stack(stack), window_size, method)
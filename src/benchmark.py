@@ -0,0 +1,456 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    PROJECT_ROOT, IMAGES_DIR, BENCHMARK_DIR, BENCHMARK_SIZES, BENCHMARK_KERNEL_SIZES, BENCHMARK_DTYPES,
+    BENCHMARK_REGRESSION_THRESHOLD
+)
+import src
+
+# call(img, size) runs the function once; size is the kernel/window size for
+# cases with kernel=True and None otherwise. Stack cases get an (N, H, W)
+# stack of STACK_FRAMES synthetic frames instead of a single image.
+Case = namedtuple('Case', ['name', 'call', 'kernel', 'dtypes', 'stack'])
+
+STACK_FRAMES = 4
+CORPUS_INPUT = 'Images'
+BOTH = ('uint8', 'float32')
+UINT8 = ('uint8',)
+
+
+@lru_cache(maxsize=None)
+def _dense_kernel(size):
+    # A fixed non-separable kernel, so convolution cases exercise the direct
+    # and FFT paths rather than the separable one.
+    kernel = np.random.default_rng(size).standard_normal((size, size)).astype(np.float32)
+    return kernel / np.abs(kernel).sum()
+
+
+def _sigma(size):
+    return max(size / 6.0, 0.5)
+
+
+def _stream_filter(img, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'input.npy'
+        np.save(source, img)
+        stages = [(lambda band: src.median_filter(band, size), size // 2)]
+        src.stream_filter(source, Path(tmp) / 'output.npy', stages)
+
+
+def _stream_pipeline(img, size):
+    stages = [(lambda band: src.box_filter(band, size), size // 2)]
+    return np.concatenate(list(src.stream_pipeline(img, stages)))
+
+
+CASES = [
+    # Transformations
+    Case('image_negative', lambda img, k: src.image_negative(img), False, BOTH, False),
+    Case('log_transformation', lambda img, k: src.log_transformation(img), False, BOTH, False),
+    Case('gamma_correction', lambda img, k: src.gamma_correction(img, 0.5), False, BOTH, False),
+    Case('bit_plane_slicing', lambda img, k: src.bit_plane_slicing(img), False, UINT8, False),
+    Case('contrast_stretching', lambda img, k: src.contrast_stretching(img), False, BOTH, False),
+    
+    # Histogram
+    Case('calculate_histogram', lambda img, k: src.calculate_histogram(img), False, UINT8, False),
+    Case('histogram_equalization', lambda img, k: src.histogram_equalization(img), False, UINT8, False),
+    Case('local_histogram_equalization', lambda img, k: src.local_histogram_equalization(img, k),
+         True, UINT8, False),
+    Case('histogram_matching', lambda img, k: src.histogram_matching(img, reference=img[::-1]),
+         False, UINT8, False),
+    Case('adaptive_histogram_equalization', lambda img, k: src.adaptive_histogram_equalization(img),
+         False, UINT8, False),
+    
+    # Filters
+    Case('integral_image', lambda img, k: src.integral_image(img), False, BOTH, False),
+    Case('box_sum', lambda img, k: src.box_sum(src.integral_image(img, k // 2), k, img.shape),
+         True, BOTH, False),
+    Case('box_filter', lambda img, k: src.box_filter(img, k), True, BOTH, False),
+    Case('gaussian_filter', lambda img, k: src.gaussian_filter(img, k, _sigma(k)), True, BOTH, False),
+    Case('median_filter', lambda img, k: src.median_filter(img, k), True, BOTH, False),
+    Case('laplacian_filter', lambda img, k: src.laplacian_filter(img), False, BOTH, False),
+    Case('sharpen_with_laplacian', lambda img, k: src.sharpen_with_laplacian(img), False, BOTH, False),
+    Case('sobel_gradient', lambda img, k: src.sobel_gradient(img), False, BOTH, False),
+    Case('image_derivatives', lambda img, k: src.image_derivatives(img), False, BOTH, False),
+    Case('unsharp_mask', lambda img, k: src.unsharp_mask(img, src.box_filter(img, k)), True, BOTH, False),
+    Case('add_mask', lambda img, k: src.add_mask(img, img, 1.5), False, BOTH, False),
+    Case('unsharp_masking', lambda img, k: src.unsharp_masking(img, k), True, BOTH, False),
+    Case('high_boost_filter', lambda img, k: src.high_boost_filter(img, k), True, BOTH, False),
+    Case('mixed_spatial_enhancement', lambda img, k: src.mixed_spatial_enhancement(img),
+         False, UINT8, False),
+    
+    # Point operations
+    Case('PointChain', lambda img, k: (src.gamma_op(0.5) >> src.equalization_op())(img),
+         False, UINT8, False),
+    
+    # Batch
+    Case('apply_lut_stack', lambda stack, k: src.apply_lut_stack(
+        stack, np.broadcast_to(src.negative_lut(), (len(stack), 256))), False, UINT8, True),
+    Case('calculate_histogram_batch', lambda stack, k: src.calculate_histogram_batch(stack),
+         False, UINT8, True),
+    Case('image_negative_batch', lambda stack, k: src.image_negative_batch(stack), False, UINT8, True),
+    Case('log_transformation_batch', lambda stack, k: src.log_transformation_batch(stack),
+         False, UINT8, True),
+    Case('gamma_correction_batch', lambda stack, k: src.gamma_correction_batch(stack, 0.5),
+         False, UINT8, True),
+    Case('contrast_stretching_batch', lambda stack, k: src.contrast_stretching_batch(stack),
+         False, UINT8, True),
+    Case('histogram_equalization_batch', lambda stack, k: src.histogram_equalization_batch(stack),
+         False, UINT8, True),
+    Case('apply_convolution_batch', lambda stack, k: src.apply_convolution_batch(stack, _dense_kernel(k)),
+         True, BOTH, True),
+    Case('box_filter_batch', lambda stack, k: src.box_filter_batch(stack, k), True, BOTH, True),
+    Case('gaussian_filter_batch', lambda stack, k: src.gaussian_filter_batch(stack, k, _sigma(k)),
+         True, BOTH, True),
+    Case('median_filter_batch', lambda stack, k: src.median_filter_batch(stack, k), True, UINT8, True),
+    Case('laplacian_filter_batch', lambda stack, k: src.laplacian_filter_batch(stack), False, BOTH, True),
+    Case('sobel_gradient_batch', lambda stack, k: src.sobel_gradient_batch(stack), False, BOTH, True),
+    Case('local_histogram_equalization_batch',
+         lambda stack, k: src.local_histogram_equalization_batch(stack, k), True, UINT8, True),
+    
+    # Streaming
+    Case('stream_pipeline', _stream_pipeline, True, BOTH, False),
+    Case('stream_filter', _stream_filter, True, UINT8, False),
+    
+    # Borders
+    Case('pad_border', lambda img, k: src.pad_border(img, k // 2), True, BOTH, False),
+    
+    # Utils
+    Case('normalize_for_display', lambda img, k: src.normalize_for_display(img), False, BOTH, False),
+    Case('apply_convolution', lambda img, k: src.apply_convolution(img, _dense_kernel(k)), True, BOTH, False),
+    Case('apply_separable_convolution', lambda img, k: src.apply_separable_convolution(
+        img, src.gaussian_kernel_1d(k, _sigma(k)), src.gaussian_kernel_1d(k, _sigma(k))), True, BOTH, False),
+    Case('correlate_bordered', lambda img, k: src.correlate_bordered(img, _dense_kernel(k)),
+         True, BOTH, False),
+    Case('apply_fft_convolution', lambda img, k: src.apply_fft_convolution(img, _dense_kernel(k)),
+         True, BOTH, False),
+]
+
+
+def uncovered():
+    # Exported names without a case: table/kernel getters, classes, cache
+    # and I/O helpers, which take no image.
+    names = {case.name for case in CASES}
+    return [name for name in src.__all__ if name not in names]
+
+
+def select_cases(patterns=None):
+    if not patterns:
+        return list(CASES)
+    selected = [case for case in CASES if any(fnmatch.fnmatch(case.name, p) for p in patterns)]
+    if not selected:
+        raise ValueError(f"No benchmark matches: {', '.join(patterns)}")
+    return selected
+
+
+def synthetic_image(size, dtype):
+    img = np.random.default_rng(size).integers(0, 256, (size, size), dtype=np.uint8)
+    return img.astype(dtype, copy=False)
+
+
+def load_corpus(pattern='*'):
+    import cv2
+    images = []
+    for path in sorted(IMAGES_DIR.glob(pattern)):
+        img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            images.append(img)
+    return images
+
+
+def _run(case, frames, size):
+    for frame in frames:
+        case.call(frame, size)
+
+
+def measure(case, frames, size, repeat=3, max_single=1.0):
+    # Wall time of one pass over the frames (median of `repeat` timed passes
+    # after a warm-up, so lookup tables and kernels are already cached), and
+    # the peak bytes allocated during one further traced pass.
+    start = time.perf_counter()
+    _run(case, frames, size)
+    warmup = time.perf_counter() - start
+    
+    times = [warmup]
+    if warmup < max_single:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _run(case, frames, size)
+            times.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    try:
+        _run(case, frames, size)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    
+    return statistics.median(times), min(times), len(times), peak
+
+
+def _record(case, input_name, frames, size, dtype, repeat):
+    pixels = sum(frame.size for frame in frames)
+    record = {
+        'function': case.name,
+        'input': input_name,
+        'shape': list(frames[0].shape) if len(frames) == 1 else None,
+        'frames': len(frames),
+        'kernel': size,
+        'dtype': dtype,
+        'megapixels': pixels / 1e6,
+    }
+    try:
+        seconds, best, repeats, peak = measure(case, frames, size, repeat)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+        return record
+    
+    record.update({
+        'seconds': seconds,
+        'best': best,
+        'repeats': repeats,
+        'mpix_per_s': pixels / 1e6 / seconds if seconds else float('inf'),
+        'peak_bytes': peak,
+    })
+    return record
+
+
+def _format_record(record):
+    kernel = f"k={record['kernel']}" if record['kernel'] is not None else ''
+    label = f"{record['function']:<36} {record['input']:<16} {kernel:<5} {record['dtype']:<7}"
+    if 'error' in record:
+        return f"{label} ✗ {record['error']}"
+    return (f"{label} {record['seconds'] * 1000:10.2f} ms {record['mpix_per_s']:9.1f} MP/s "
+            f"{record['peak_bytes'] / 1e6:9.1f} MB")
+
+
+def run_benchmarks(cases, sizes=BENCHMARK_SIZES, kernel_sizes=BENCHMARK_KERNEL_SIZES,
+                   dtypes=BENCHMARK_DTYPES, corpus=None, repeat=3, max_seconds=10.0, log=print):
+    # Sizes run smallest first; once a (function, kernel, dtype) combination
+    # takes longer than max_seconds, its larger sizes are skipped.
+    records = []
+    for case in cases:
+        for dtype in [d for d in dtypes if d in case.dtypes]:
+            for size in (kernel_sizes if case.kernel else [None]):
+                for side in sorted(sizes):
+                    img = synthetic_image(side, dtype)
+                    frames = [np.stack([img] * STACK_FRAMES)] if case.stack else [img]
+                    record = _record(case, f"synthetic-{side}", frames, size, dtype, repeat)
+                    records.append(record)
+                    log(_format_record(record))
+                    if record.get('seconds', 0) > max_seconds:
+                        log(f"{'':36} skipping larger sizes (over {max_seconds:g}s)")
+                        break
+                
+                if corpus and not case.stack:
+                    frames = [img.astype(dtype, copy=False) for img in corpus]
+                    record = _record(case, CORPUS_INPUT, frames, size, dtype, repeat)
+                    records.append(record)
+                    log(_format_record(record))
+    return records
+
+
+# Import-time cases: each statement runs in a fresh interpreter, which is
+# what a short-lived worker process pays before doing any work.
+IMPORT_STATEMENTS = [
+    'import src',
+    'from src import box_filter',
+    'from src import histogram_equalization, median_filter, sobel_gradient',
+    'from src import load_image',
+    'import src.cli',
+]
+HEAVY_MODULES = ('cv2', 'matplotlib', 'scipy')
+
+_IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, *[name for name in {heavy!r} if name in sys.modules])
+"""
+
+
+def import_times(statements=IMPORT_STATEMENTS, repeat=5, log=print):
+    records = []
+    for statement in statements:
+        probe = _IMPORT_PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+        times, process_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', probe], cwd=PROJECT_ROOT,
+                                    capture_output=True, text=True)
+            process_times.append(time.perf_counter() - start)
+            if result.returncode:
+                raise ValueError(f"'{statement}' failed: {result.stderr.strip()}")
+            seconds, *loaded = result.stdout.split()
+            times.append(float(seconds))
+        
+        record = {
+            'function': statement,
+            'input': 'import',
+            'kernel': None,
+            'dtype': '-',
+            'seconds': statistics.median(times),
+            'best': min(times),
+            'repeats': repeat,
+            'process_seconds': statistics.median(process_times),
+            'loaded': loaded,
+        }
+        records.append(record)
+        log(f"{statement:<68} {record['seconds'] * 1000:8.1f} ms "
+            f"(process {record['process_seconds'] * 1000:6.1f} ms) loads: {', '.join(loaded) or '-'}")
+    return records
+
+
+def _key(record):
+    return (record['function'], record['input'], record['kernel'], record['dtype'])
+
+
+def compare(records, baseline, threshold=BENCHMARK_REGRESSION_THRESHOLD):
+    # Ratio of new to baseline median time for every case present in both;
+    # ratios above 1 + threshold are regressions.
+    previous = {_key(r): r for r in baseline if 'seconds' in r}
+    rows = []
+    for record in records:
+        old = previous.get(_key(record))
+        if old is None or 'seconds' not in record:
+            continue
+        ratio = record['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        rows.append({
+            'function': record['function'],
+            'input': record['input'],
+            'kernel': record['kernel'],
+            'dtype': record['dtype'],
+            'baseline': old['seconds'],
+            'seconds': record['seconds'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return rows
+
+
+def environment():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def save_results(records, path, settings=None):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {'environment': environment(), 'settings': settings or {}, 'results': records}
+    path.write_text(json.dumps(data, indent=2))
+    return path
+
+
+def load_results(path):
+    return json.loads(Path(path).read_text())['results']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time every public image function over a matrix of sizes, kernels and dtypes.")
+    parser.add_argument('-f', '--functions', nargs='+', metavar='PATTERN',
+                        help="only run matching functions, e.g. 'median*' box_filter")
+    parser.add_argument('--sizes', nargs='+', type=int, default=BENCHMARK_SIZES,
+                        help="synthetic square image sizes")
+    parser.add_argument('--kernels', nargs='+', type=int, default=BENCHMARK_KERNEL_SIZES,
+                        help="kernel/window sizes")
+    parser.add_argument('--dtypes', nargs='+', default=BENCHMARK_DTYPES, choices=BOTH)
+    parser.add_argument('--images', default='*', metavar='GLOB',
+                        help="files in Images/ to benchmark as one real-image input")
+    parser.add_argument('--no-images', action='store_true', help="synthetic inputs only")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case")
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help="skip larger sizes once a case takes longer than this")
+    parser.add_argument('-o', '--output', default=None,
+                        help="results JSON (default: results/benchmarks/benchmark-<time>.json)")
+    parser.add_argument('--baseline', default=None, help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_REGRESSION_THRESHOLD,
+                        help="slowdown ratio over the baseline reported as a regression")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="write these results to the --baseline path after comparing")
+    parser.add_argument('--imports', action='store_true',
+                        help="time package imports in fresh interpreters instead")
+    parser.add_argument('--list', action='store_true', help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+    
+    try:
+        cases = select_cases(args.functions)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.list:
+        for case in cases:
+            kinds = ', '.join(case.dtypes) + (', kernel sizes' if case.kernel else '') + \
+                (', stack' if case.stack else '')
+            print(f"{case.name:<36} {kinds}")
+        print(f"\nNot benchmarked (no image input): {', '.join(uncovered())}")
+        return 0
+    
+    baseline = None
+    if args.baseline and Path(args.baseline).exists():
+        baseline = load_results(args.baseline)
+    elif args.baseline and not args.update_baseline:
+        parser.error(f"Baseline not found: {args.baseline}")
+    
+    if args.imports:
+        records = import_times(repeat=max(args.repeat, 5))
+        settings = {'imports': IMPORT_STATEMENTS, 'repeat': max(args.repeat, 5)}
+    else:
+        corpus = None if args.no_images else load_corpus(args.images)
+        records = run_benchmarks(cases, args.sizes, args.kernels, args.dtypes, corpus,
+                                 args.repeat, args.max_seconds)
+        settings = {'sizes': args.sizes, 'kernels': args.kernels, 'dtypes': args.dtypes,
+                    'repeat': args.repeat, 'images': None if args.no_images else args.images}
+    
+    prefix = 'imports' if args.imports else 'benchmark'
+    output = args.output or BENCHMARK_DIR / f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    print(f"\nSaved {len(records)} results to {save_results(records, output, settings)}")
+    
+    failed = [r for r in records if 'error' in r]
+    if failed:
+        print(f"{len(failed)} cases failed")
+    
+    regressions = []
+    if baseline is not None:
+        rows = compare(records, baseline, args.threshold)
+        regressions = [row for row in rows if row['regression']]
+        print(f"Compared {len(rows)} cases with {args.baseline}: "
+              f"{len(regressions)} slower than {1 + args.threshold:.2f}x")
+        for row in sorted(regressions, key=lambda row: -row['ratio']):
+            kernel = f"k={row['kernel']}" if row['kernel'] is not None else ''
+            print(f"  {row['function']:<36} {row['input']:<16} {kernel:<5} {row['dtype']:<7} "
+                  f"{row['baseline'] * 1000:9.2f} -> {row['seconds'] * 1000:9.2f} ms "
+                  f"({row['ratio']:.2f}x)")
+    
+    if args.update_baseline and args.baseline:
+        save_results(records, args.baseline, settings)
+        print(f"Updated baseline {args.baseline}")
+    
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+from functools import lru_cache
+
+# Border modes use OpenCV's names. np.pad's 'reflect' does not repeat the edge
+# pixel, which is OpenCV's reflect-101; OpenCV's 'reflect' repeats it
+# (np.pad 'symmetric'). reflect-101 is what every filter here has always used.
+BORDER_MODES = {
+    'reflect': 'symmetric',
+    'reflect-101': 'reflect',
+    'replicate': 'edge',
+    'constant': 'constant',
+    'wrap': 'wrap',
+}
+DEFAULT_BORDER = 'reflect-101'
+
+
+def check_border(border):
+    if border not in BORDER_MODES:
+        raise ValueError(f"Unknown border mode: {border}. Available: {', '.join(BORDER_MODES)}")
+    return border
+
+
+@lru_cache(maxsize=512)
+def border_index(n, pad, border=DEFAULT_BORDER):
+    # Source index for each of the n + 2*pad positions of a padded axis
+    # (position k is coordinate k - pad); -1 marks a constant-border position.
+    mode = BORDER_MODES[check_border(border)]
+    kwargs = {'constant_values': -1} if border == 'constant' else {}
+    index = np.pad(np.arange(n), pad, mode=mode, **kwargs)
+    index.setflags(write=False)
+    return index
+
+
+def padded_shape(shape, pad_y, pad_x=None):
+    if pad_x is None:
+        pad_x = pad_y
+    return tuple(shape[:-2]) + (shape[-2] + 2 * pad_y, shape[-1] + 2 * pad_x)
+
+
+def gather(img, rows, cols, border_value=0, dtype=None):
+    # img at the given source rows/cols (from border_index), as a new array.
+    block = img[..., np.maximum(rows, 0)[:, None], np.maximum(cols, 0)[None, :]]
+    if dtype is not None:
+        block = block.astype(dtype, copy=False)
+    if rows.min(initial=0) < 0 or cols.min(initial=0) < 0:
+        block[..., rows < 0, :] = border_value
+        block[..., :, cols < 0] = border_value
+    return block
+
+
+def pad_border(img, pad_y, pad_x=None, border=DEFAULT_BORDER, border_value=0, out=None):
+    # Pads the two spatial axes only, so (N, H, W) stacks work too. With out=
+    # the padded image (converted to out's dtype) is written into an existing
+    # buffer: the image is copied once and only the border strips are gathered.
+    if pad_x is None:
+        pad_x = pad_y
+    h, w = img.shape[-2:]
+    rows = border_index(h, pad_y, border)
+    cols = border_index(w, pad_x, border)
+    
+    if out is None:
+        pad_width = ((0, 0),) * (img.ndim - 2) + ((pad_y, pad_y), (pad_x, pad_x))
+        kwargs = {'constant_values': border_value} if border == 'constant' else {}
+        return np.pad(img, pad_width, mode=BORDER_MODES[border], **kwargs)
+    
+    out[..., pad_y:pad_y+h, pad_x:pad_x+w] = img
+    if pad_x:
+        inner = out[..., pad_y:pad_y+h, :]
+        inner[..., :pad_x] = gather(img, np.arange(h), cols[:pad_x], border_value)
+        inner[..., pad_x+w:] = gather(img, np.arange(h), cols[pad_x+w:], border_value)
+    if pad_y:
+        edge_rows = np.concatenate([rows[:pad_y], rows[pad_y+h:]])
+        edge = np.take(out, np.maximum(edge_rows, 0) + pad_y, axis=-2)
+        edge[..., edge_rows < 0, :] = border_value
+        out[..., :pad_y, :] = edge[..., :pad_y, :]
+        out[..., pad_y+h:, :] = edge[..., pad_y:, :]
+    return out
+
+
+def border_regions(img, pad_y, pad_x, border=DEFAULT_BORDER, border_value=0, dtype=None):
+    # Splits a neighbourhood operation into the interior, whose windows lie
+    # inside img and read it in place, and the (at most four) border strips,
+    # whose windows are gathered through the border index maps. Yields
+    # (rows, cols, block) where rows/cols are output slices and block is laid
+    # out like the padded image for that region: the (di, dj) tap of the
+    # output region is block[..., di:di+region_h, dj:dj+region_w].
+    h, w = img.shape[-2:]
+    row_map = border_index(h, pad_y, border)
+    col_map = border_index(w, pad_x, border)
+
+    def strip(r0, r1, c0, c1):
+        block = gather(img, row_map[r0:r1 + 2 * pad_y], col_map[c0:c1 + 2 * pad_x], border_value, dtype)
+        return slice(r0, r1), slice(c0, c1), block
+    
+    if h <= 2 * pad_y or w <= 2 * pad_x:
+        yield strip(0, h, 0, w)
+        return
+    
+    yield slice(pad_y, h - pad_y), slice(pad_x, w - pad_x), img
+    if pad_y:
+        yield strip(0, pad_y, 0, w)
+        yield strip(h - pad_y, h, 0, w)
+    if pad_x:
+        yield strip(pad_y, h - pad_y, 0, pad_x)
+        yield strip(pad_y, h - pad_y, w - pad_x, w)
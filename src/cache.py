@@ -0,0 +1,259 @@
+import hashlib
+import inspect
+import sys
+from collections import OrderedDict
+from functools import partial, wraps
+from pathlib import Path
+
+import numpy as np
+
+from config import CACHE_DIR, CACHE_MAX_BYTES
+from src.pipeline import _freeze
+from src.workspace import into
+
+# Arguments that say where a result is computed rather than what it is:
+# they are left out of the key, and an out= buffer is filled on hits too.
+UNKEYED_ARGUMENTS = ('out', 'workspace')
+
+
+def _unwrap(fn, args, kwargs):
+    # partial(f, a, k=1)(x) is the call f(a, x, k=1).
+    while isinstance(fn, partial):
+        args = tuple(fn.args) + tuple(args)
+        kwargs = {**fn.keywords, **kwargs}
+        fn = fn.func
+    return fn, args, kwargs
+
+
+def _named(fn):
+    # Module-level functions are identified by name, also across runs;
+    # lambdas, closures and other callables are not.
+    qualname = getattr(fn, '__qualname__', None)
+    module = getattr(fn, '__module__', None)
+    if qualname is None or module is None or '<lambda>' in qualname or '<locals>' in qualname:
+        return None
+    return f"{module}.{qualname}"
+
+
+def _arguments(fn, args, kwargs):
+    # Every parameter by name, defaults included, so box_filter(img, 5) and
+    # box_filter(img, size=5) bind the same; positional for signatures that
+    # cannot be inspected.
+    try:
+        bound = inspect.signature(fn).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return {**{str(i): value for i, value in enumerate(args)}, **kwargs}
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def result_key(fn, args=(), kwargs=None):
+    # Content address of a call: function identity, a digest of every array
+    # argument and the remaining parameters after binding to the signature,
+    # so box_filter(img, 5) and box_filter(img, size=5) share one entry.
+    # out= and workspace= are not part of it.
+    # Named functions get a hex digest, which is also the disk file name.
+    # Anonymous ones (lambdas, closures, callable objects) get a
+    # (function, digest) pair instead: it only matches that very object and
+    # is kept to the memory tier.
+    fn, args, kwargs = _unwrap(fn, tuple(args), kwargs or {})
+    arguments = {key: value for key, value in _arguments(fn, args, kwargs).items()
+                 if key not in UNKEYED_ARGUMENTS}
+    name = _named(fn)
+    text = repr((name, _freeze(arguments)))
+    digest = hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+    return digest if name is not None else (fn, digest)
+
+
+def _arrays(value):
+    # Every array in value, including inside nested containers such as an
+    # out= dict passed among the keyword arguments.
+    if isinstance(value, np.ndarray):
+        return [value]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        return [array for item in value for array in _arrays(item)]
+    return []
+
+
+def _nbytes(value):
+    arrays = _arrays(value)
+    return sum(a.nbytes for a in arrays) if arrays else sys.getsizeof(value)
+
+
+def _freeze_result(value, inputs=()):
+    # Cached results are shared between callers, so they are handed out
+    # read-only, like the cached lookup tables. A result that aliases one of
+    # the call's arrays (an input returned as is, an out= buffer) is copied
+    # first rather than locking the caller's array.
+    def frozen(item):
+        if not isinstance(item, np.ndarray):
+            return item
+        if any(np.may_share_memory(item, array) for array in inputs):
+            item = item.copy()
+        item.setflags(write=False)
+        return item
+    
+    if isinstance(value, dict):
+        return {key: frozen(item) for key, item in value.items()}
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return type(value)(*map(frozen, value))
+    if isinstance(value, (tuple, list)):
+        return type(value)(map(frozen, value))
+    return frozen(value)
+
+
+def _fill(out, value):
+    if isinstance(out, dict):
+        return {key: into(out.get(key), item) for key, item in value.items()}
+    return into(out, value)
+
+
+def _save(path_stem, value):
+    if isinstance(value, np.ndarray):
+        np.save(path_stem.with_suffix('.npy'), value)
+    elif isinstance(value, (tuple, list)):
+        np.savez(path_stem.with_suffix('.npz'), **{f't{i}': v for i, v in enumerate(value)})
+    elif isinstance(value, dict):
+        np.savez(path_stem.with_suffix('.npz'), **{f'd_{k}': v for k, v in value.items()})
+    else:
+        return False
+    return True
+
+
+def _load(path_stem):
+    npy = path_stem.with_suffix('.npy')
+    if npy.exists():
+        return np.load(npy)
+    
+    npz = path_stem.with_suffix('.npz')
+    if npz.exists():
+        with np.load(npz) as data:
+            names = data.files
+            if names and names[0].startswith('d_'):
+                return {name[2:]: data[name] for name in names}
+            return tuple(data[f't{i}'] for i in range(len(names)))
+    return None
+
+
+class ResultCache:
+    # Two tiers: an in-memory LRU bounded by the total bytes of the cached
+    # arrays, and an optional directory of NPY/NPZ files that survives
+    # between runs.
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.bytes += size
+        
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key][0]
+        
+        if self.directory is not None and isinstance(key, str):
+            value = _load(self.directory / key)
+            if value is not None:
+                value = _freeze_result(value)
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return True, value
+        
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value, inputs=()):
+        value = _freeze_result(value, inputs)
+        self._remember(key, value)
+        if self.directory is not None and isinstance(key, str):
+            self.directory.mkdir(parents=True, exist_ok=True)
+            _save(self.directory / key, value)
+        return value
+
+    def call(self, fn, *args, **kwargs):
+        # With out=, the caller's buffer receives the result on hits as well
+        # as misses, and is what gets returned.
+        key = result_key(fn, args, kwargs)
+        bound_fn, bound_args, bound_kwargs = _unwrap(fn, args, kwargs)
+        out = _arguments(bound_fn, bound_args, bound_kwargs).get('out')
+        found, value = self.get(key)
+        if found:
+            return value if out is None else _fill(out, value)
+        
+        inputs = _arrays(list(bound_args)) + _arrays(bound_kwargs)
+        result = fn(*args, **kwargs)
+        value = self.put(key, result, inputs)
+        return value if out is None else result
+
+    def wrap(self, fn):
+        @wraps(fn)
+        def cached_fn(*args, **kwargs):
+            return self.call(fn, *args, **kwargs)
+        return cached_fn
+
+    def clear(self, disk=False):
+        self._entries.clear()
+        self.bytes = 0
+        if disk and self.directory is not None and self.directory.exists():
+            for path in list(self.directory.glob('*.np[yz]')):
+                path.unlink()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+
+default_cache = ResultCache()
+
+
+def enable_disk_cache(directory=CACHE_DIR):
+    default_cache.directory = Path(directory)
+    return default_cache
+
+
+def cached(fn=None, cache=None):
+    # @cached, @cached(cache=my_cache) or cached(box_filter)
+    def decorate(fn):
+        return (cache if cache is not None else default_cache).wrap(fn)
+    return decorate(fn) if fn is not None else decorate
+
+
+def cache_stats():
+    return default_cache.stats()
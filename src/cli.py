@@ -0,0 +1,246 @@
+import argparse
+import ast
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.transformations import (
+    image_negative, log_transformation, gamma_correction, contrast_stretching
+)
+from src.histogram import (
+    histogram_equalization, local_histogram_equalization, adaptive_histogram_equalization
+)
+from src.filters import (
+    box_filter, gaussian_filter, median_filter, laplacian_filter, sharpen_with_laplacian,
+    sobel_gradient, unsharp_masking, high_boost_filter
+)
+from src.utils import normalize_for_display
+from src.tiling import resolve_workers
+
+
+def _equalize(img):
+    return histogram_equalization(img)[0]
+
+
+def _unsharp(img, blur_size=5, k=1.0):
+    return unsharp_masking(img, blur_size, k)[2]
+
+
+OPERATIONS = {
+    'negative': image_negative,
+    'log': log_transformation,
+    'gamma': gamma_correction,
+    'contrast': contrast_stretching,
+    'equalize': _equalize,
+    'local_equalize': local_histogram_equalization,
+    'clahe': adaptive_histogram_equalization,
+    'box': box_filter,
+    'gaussian': gaussian_filter,
+    'median': median_filter,
+    'laplacian': laplacian_filter,
+    'sharpen': sharpen_with_laplacian,
+    'sobel': sobel_gradient,
+    'unsharp': _unsharp,
+    'high_boost': high_boost_filter,
+    'normalize': normalize_for_display,
+}
+
+
+def _parse_value(text):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def parse_pipeline(spec):
+    # "median:size=3|gaussian:size=5,sigma=1.0|gamma:gamma=0.5"
+    pipeline = []
+    for step in filter(None, (part.strip() for part in spec.split('|'))):
+        name, _, arg_text = step.partition(':')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Available: {', '.join(sorted(OPERATIONS))}")
+        
+        params = {}
+        for arg in filter(None, (a.strip() for a in arg_text.split(','))):
+            key, sep, value = arg.partition('=')
+            if not sep:
+                raise ValueError(f"Expected key=value in '{step}', got '{arg}'")
+            params[key.strip()] = _parse_value(value.strip())
+        pipeline.append((name, params))
+    
+    if not pipeline:
+        raise ValueError("Empty operation pipeline")
+    return pipeline
+
+
+def run_pipeline(img, pipeline):
+    for name, params in pipeline:
+        img = OPERATIONS[name](img, **params)
+    return img
+
+
+def _decode(path):
+    import cv2
+    start = time.perf_counter()
+    img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Could not decode {path}")
+    return img, time.perf_counter() - start
+
+
+def _encode(result, path):
+    import cv2
+    start = time.perf_counter()
+    if result.dtype != np.uint8:
+        result = normalize_for_display(result)
+    if not cv2.imwrite(str(path), result):
+        raise ValueError(f"Could not write {path}")
+    return time.perf_counter() - start
+
+
+def process_chunk(jobs, spec):
+    # Runs in a worker process on (input, output) path pairs. One I/O thread
+    # decodes the next file and encodes the previous result while this
+    # thread computes the current one.
+    pipeline = parse_pipeline(spec)
+    records = []
+    
+    with ThreadPoolExecutor(max_workers=2) as io:
+        next_read = io.submit(_decode, jobs[0][0])
+        pending = []
+        
+        for index, (path, out_path) in enumerate(jobs):
+            record = {'path': str(path)}
+            try:
+                img, record['decode'] = next_read.result()
+            except Exception as e:
+                img, record['error'] = None, str(e)
+            
+            if index + 1 < len(jobs):
+                next_read = io.submit(_decode, jobs[index + 1][0])
+            
+            if img is not None:
+                try:
+                    start = time.perf_counter()
+                    result = run_pipeline(img, pipeline)
+                    record['compute'] = time.perf_counter() - start
+                    record['output'] = str(out_path)
+                    pending.append((record, io.submit(_encode, result, out_path)))
+                except Exception as e:
+                    record['error'] = str(e)
+            records.append(record)
+        
+        for record, future in pending:
+            try:
+                record['encode'] = future.result()
+            except Exception as e:
+                record['error'] = str(e)
+    
+    return records
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _format_record(record, done, total):
+    name = record['path']
+    if 'error' in record:
+        return f"[{done}/{total}] ✗ {name}: {record['error']}"
+    timings = ' '.join(f"{stage}={record[stage] * 1000:.1f}ms"
+                       for stage in ('decode', 'compute', 'encode') if stage in record)
+    return f"[{done}/{total}] ✓ {name} {timings}"
+
+
+def output_paths(paths, output_dir, extension='.png'):
+    # Mirrors each input's path relative to the inputs' common directory
+    # under output_dir, so files with the same name in different
+    # directories do not overwrite each other. Inputs that would still
+    # share an output (x.jpg and x.png) are rejected up front.
+    output_dir = Path(output_dir)
+    if not paths:
+        return []
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    outputs = [output_dir / Path(os.path.relpath(os.path.abspath(p), base)).with_suffix(extension)
+               for p in paths]
+    
+    sources = {}
+    for path, out_path in zip(paths, outputs):
+        sources.setdefault(out_path, []).append(str(path))
+    clashes = [f"{', '.join(names)} -> {out_path}"
+               for out_path, names in sources.items() if len(names) > 1]
+    if clashes:
+        raise ValueError("Inputs would overwrite each other: " + '; '.join(clashes))
+    return outputs
+
+
+def process_files(paths, spec, output_dir, workers=None, chunk_size=8, extension='.png',
+                  log=print):
+    parse_pipeline(spec)
+    outputs = output_paths(paths, output_dir, extension)
+    for directory in sorted({out_path.parent for out_path in outputs}):
+        directory.mkdir(parents=True, exist_ok=True)
+    workers = resolve_workers(workers)
+    
+    jobs = list(zip(paths, outputs))
+    total = len(jobs)
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_chunk, chunk, spec)
+                   for chunk in _chunks(jobs, chunk_size)]
+        for future in as_completed(futures):
+            for record in future.result():
+                records.append(record)
+                log(_format_record(record, len(records), total))
+    
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Apply an operation pipeline to every image matching a glob.")
+    parser.add_argument('input', help="input glob, e.g. 'Images/*.jpg' (quote it)")
+    parser.add_argument('--ops', required=True,
+                        help="pipeline spec, e.g. 'median:size=3|gamma:gamma=0.5'")
+    parser.add_argument('-o', '--output-dir', required=True, help="directory for results")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=8, help="files per worker task")
+    parser.add_argument('--format', default='png', help="output image format")
+    args = parser.parse_args(argv)
+    
+    paths = sorted(p for p in glob.glob(args.input, recursive=True) if os.path.isfile(p))
+    if not paths:
+        print(f"No files match {args.input}")
+        return 1
+    
+    extension = '.' + args.format.lstrip('.')
+    try:
+        parse_pipeline(args.ops)
+        output_paths(paths, args.output_dir, extension)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    print(f"Processing {len(paths)} files with {resolve_workers(args.workers)} workers")
+    start = time.perf_counter()
+    records = process_files(paths, args.ops, args.output_dir, args.workers,
+                            args.chunk_size, extension)
+    elapsed = time.perf_counter() - start
+    
+    failed = sum('error' in record for record in records)
+    print(f"Done: {len(records) - failed} ok, {failed} failed in {elapsed:.2f}s "
+          f"({len(records) / elapsed:.1f} files/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,117 +1,439 @@
 import numpy as np
-from pathlib import Path
-import sys
-sys.path.append(str(Path(__file__).parent.parent))
-from src.utils import apply_convolution
-from config import LAPLACIAN_KERNEL, SOBEL_X_KERNEL, SOBEL_Y_KERNEL
+from functools import lru_cache, partial
+from src.utils import (
+    apply_convolution, correlate_padded,
+    iter_window_histograms, window_fine_block
+)
+from src.workspace import scratch, output, into
+from src.borders import DEFAULT_BORDER, check_border, pad_border, padded_shape, border_regions
+from src.tiling import run_tiled
+from src.pipeline import Pipeline
+from src.kernels import get_kernel
 
 
-def box_filter(img, size):
-    kernel = np.ones((size, size), dtype=np.float32) / (size * size)
-    filtered = apply_convolution(img, kernel)
-    return np.clip(filtered, 0, 255).astype(np.uint8)
+def box_kernel_1d(size):
+    return get_kernel('box', size).factors[0]
+
+
+def _integral_layout(shape, dtype, pad=0):
+    table_dtype = np.int64 if np.issubdtype(dtype, np.integer) else np.float64
+    h, w = shape[-2:]
+    return tuple(shape[:-2]) + (h + 2 * pad + 1, w + 2 * pad + 1), table_dtype
+
+
+def integral_image(img, pad=0, out=None, workspace=None, border=DEFAULT_BORDER, border_value=0):
+    if pad > 0:
+        img_padded = pad_border(img, pad, None, border, border_value,
+                                out=scratch(workspace, 'integral_padded', padded_shape(img.shape, pad), img.dtype))
+    else:
+        img_padded = img
+    
+    table_shape, dtype = _integral_layout(img.shape, img.dtype, pad)
+    table = output(out, table_shape, dtype)
+    table[..., 0, :] = 0
+    table[..., :, 0] = 0
+    sums = table[..., 1:, 1:]
+    np.copyto(sums, img_padded)
+    np.cumsum(sums, axis=-2, out=sums)
+    np.cumsum(sums, axis=-1, out=sums)
+    return table
+
+
+def box_sum(table, size, shape, out=None):
+    h, w = shape[-2:]
+    pad = (table.shape[-2] - 1 - h) // 2
+    if pad < size // 2 or (table.shape[-1] - 1 - w) // 2 != pad:
+        raise ValueError(f"Integral image padding {pad} is too small for size {size}")
+    
+    o = pad - size // 2
+    bottom, right = o + size, o + size
+    sums = output(out, table.shape[:-2] + (h, w), table.dtype)
+    np.subtract(table[..., bottom:bottom+h, right:right+w], table[..., o:o+h, right:right+w], out=sums)
+    sums -= table[..., bottom:bottom+h, o:o+w]
+    sums += table[..., o:o+h, o:o+w]
+    return sums
+
+
+def _clip_to_uint8(values, out=None):
+    np.clip(values, 0, 255, out=values)
+    if out is None:
+        return values.astype(np.uint8)
+    return into(out, values)
+
+
+def box_filter(img, size, method='auto', integral=None, workers=1, executor='thread',
+               out=None, workspace=None, border=DEFAULT_BORDER, border_value=0):
+    if method not in ('auto', 'integral', 'separable'):
+        raise ValueError(f"Unknown box filter method: {method}")
+    check_border(border)
+    if integral is not None:
+        # A precomputed table already fixes the border it was padded with,
+        # and covers the whole image.
+        if method == 'separable':
+            raise ValueError("integral= needs method 'integral' or 'auto'")
+        if border != DEFAULT_BORDER or border_value != 0:
+            raise ValueError("integral= cannot be combined with border=; pass it to integral_image")
+        if workers != 1:
+            raise ValueError("integral= cannot be combined with workers")
+    
+    if workers != 1:
+        band_fn = partial(box_filter, size=size, method=method, border=border, border_value=border_value)
+        return into(out, run_tiled(band_fn, img, size // 2, workers, executor, border, border_value))
+    
+    if method == 'auto':
+        use_integral = integral is not None or np.issubdtype(img.dtype, np.integer)
+        method = 'integral' if use_integral else 'separable'
+    
+    if method == 'integral':
+        if integral is None:
+            table_shape, dtype = _integral_layout(img.shape, img.dtype, size // 2)
+            integral = integral_image(img, size // 2, scratch(workspace, 'integral', table_shape, dtype),
+                                      workspace, border, border_value)
+        sums = box_sum(integral, size, img.shape, scratch(workspace, 'box_sums', img.shape, integral.dtype))
+        filtered = scratch(workspace, 'filtered', img.shape)
+        np.copyto(filtered, sums, casting='unsafe')
+        filtered /= np.float32(size * size)
+    else:
+        kernel = get_kernel('box', size)
+        filtered = apply_convolution(img, kernel.kernel, method='separable', factors=kernel.factors,
+                                     out=scratch(workspace, 'filtered', img.shape), workspace=workspace,
+                                     border=border, border_value=border_value)
+    
+    return _clip_to_uint8(filtered, out)
+
+
+def gaussian_kernel_1d(size, sigma):
+    return get_kernel('gaussian', size, sigma).factors[0]
 
 
 def gaussian_kernel(size, sigma):
-    kernel = np.zeros((size, size), dtype=np.float32)
-    center = size // 2
+    # The kernel gaussian_filter applies: shared and read-only, from the bank.
+    return get_kernel('gaussian', size, sigma).kernel
+
+
+def gaussian_filter(img, size, sigma, workers=1, executor='thread', out=None, workspace=None,
+                    border=DEFAULT_BORDER, border_value=0):
+    kernel = get_kernel('gaussian', size, sigma)
+    filtered = apply_convolution(img, kernel.kernel, factors=kernel.factors,
+                                 workers=workers, executor=executor,
+                                 out=scratch(workspace, 'filtered', img.shape), workspace=workspace,
+                                 border=border, border_value=border_value)
+    return _clip_to_uint8(filtered, out)
+
+
+def _oddeven_merge_sort_network(n):
+    pairs = []
+    p = 1
+    while p < n:
+        k = p
+        while k >= 1:
+            for j in range(k % p, n - k, 2 * k):
+                for i in range(min(k, n - j - k)):
+                    if (i + j) // (2 * p) == (i + j + k) // (2 * p):
+                        pairs.append((i + j, i + j + k))
+            k //= 2
+        p *= 2
+    return pairs
+
+
+@lru_cache(maxsize=None)
+def median_network(n):
+    # Batcher's odd-even merge sort on the next power of two, padded with +inf
+    # wires (comparators touching them are no-ops), then pruned back to the
+    # comparators that can still influence the middle wire.
+    width = 1
+    while width < n:
+        width *= 2
+    pairs = [(i, j) for i, j in _oddeven_merge_sort_network(width) if j < n]
+    
+    needed = {n // 2}
+    network = []
+    for i, j in reversed(pairs):
+        if i in needed or j in needed:
+            network.append((i, j))
+            needed.update((i, j))
+    return tuple(reversed(network))
+
+
+def _median_by_network(img_padded, size, shape, out=None, workspace=None):
+    h, w = shape[-2:]
+    wires = []
+    for di in range(size):
+        for dj in range(size):
+            wire = scratch(workspace, f'wire{len(wires)}', shape, img_padded.dtype)
+            np.copyto(wire, img_padded[..., di:di+h, dj:dj+w])
+            wires.append(wire)
+    tmp = scratch(workspace, 'wire_tmp', shape, img_padded.dtype)
     
-    for i in range(size):
-        for j in range(size):
-            x, y = i - center, j - center
-            kernel[i, j] = np.exp(-(x**2 + y**2) / (2 * sigma**2))
+    for i, j in median_network(size * size):
+        np.minimum(wires[i], wires[j], out=tmp)
+        np.maximum(wires[i], wires[j], out=wires[j])
+        wires[i], tmp = tmp, wires[i]
     
-    kernel = kernel / np.sum(kernel)
-    return kernel
+    median = wires[(size * size) // 2]
+    if workspace is None:
+        return into(out, median)
+    return into(output(out, shape, median.dtype), median)
 
 
-def gaussian_filter(img, size, sigma):
-    kernel = gaussian_kernel(size, sigma)
-    filtered = apply_convolution(img, kernel)
-    return np.clip(filtered, 0, 255).astype(np.uint8)
+def _median_by_histogram(img_padded, size, shape):
+    h, w = shape
+    rank = (size * size) // 2
+    out_cols = np.arange(w)
+    result = np.empty(shape, dtype=np.uint8)
+    
+    for i, (kernel_coarse, fine_blocks) in enumerate(iter_window_histograms(img_padded, size, shape)):
+        coarse_rank = np.cumsum(kernel_coarse, axis=1)
+        c = np.argmax(coarse_rank > rank, axis=1)
+        below = coarse_rank[out_cols, c] - kernel_coarse[out_cols, c]
+        
+        fine_rank = np.cumsum(window_fine_block(fine_blocks, c, size), axis=1) + below[:, None]
+        f = np.argmax(fine_rank > rank, axis=1)
+        result[i] = c * 16 + f
+    
+    return result
+
+
+# Most memory the 'sort' median's window copies may take at once.
+SORT_MEDIAN_BLOCK_BYTES = 32 * 1024 * 1024
 
 
-def median_filter(img, size=3):
+def median_filter(img, size=3, method='auto', workers=1, executor='thread', out=None, workspace=None,
+                  border=DEFAULT_BORDER, border_value=0):
+    if method not in ('auto', 'network', 'histogram', 'sort'):
+        raise ValueError(f"Unknown median filter method: {method}")
+    check_border(border)
+    
+    if workers != 1:
+        band_fn = partial(median_filter, size=size, method=method, border=border, border_value=border_value)
+        return into(out, run_tiled(band_fn, img, size // 2, workers, executor, border, border_value))
+    
+    if method == 'auto':
+        if img.dtype != np.uint8 or size % 2 == 0:
+            method = 'sort'
+        elif size <= 5:
+            method = 'network'
+        else:
+            method = 'histogram'
+    elif method != 'sort' and (img.dtype != np.uint8 or size % 2 == 0):
+        raise ValueError(f"Method '{method}' requires uint8 input and an odd size")
+    
+    if img.ndim > 2 and method != 'network':
+        frames = [median_filter(frame, size, method, border=border, border_value=border_value) for frame in img]
+        return into(out, np.stack(frames))
+    
     pad = size // 2
-    img_padded = np.pad(img, pad, mode='reflect')
-    h, w = img.shape
-    result = np.zeros_like(img)
+    h, w = img.shape[-2:]
     
-    for i in range(h):
-        for j in range(w):
-            window = img_padded[i:i+size, j:j+size]
-            result[i, j] = np.median(window)
+    if method == 'network':
+        result = output(out, img.shape, img.dtype)
+        for rows, cols, block in border_regions(img, pad, pad, border, border_value):
+            region = result[..., rows, cols]
+            _median_by_network(block, size, region.shape, region, workspace)
+        return result
     
+    img_padded = pad_border(img, pad, None, border, border_value,
+                            out=scratch(workspace, 'padded', padded_shape(img.shape, pad), img.dtype))
+    if method == 'histogram':
+        return into(out, _median_by_histogram(img_padded, size, img.shape))
+    
+    # np.median copies the windows it sorts, so rows are taken in blocks
+    # whose copies fit in SORT_MEDIAN_BLOCK_BYTES whatever the frame size.
+    windows = np.lib.stride_tricks.sliding_window_view(img_padded, (size, size))[:h, :w]
+    result = output(out, img.shape, img.dtype)
+    block_rows = max(1, SORT_MEDIAN_BLOCK_BYTES // (w * size * size * img.itemsize))
+    for start in range(0, h, block_rows):
+        result[start:start + block_rows] = np.median(windows[start:start + block_rows], axis=(-2, -1))
     return result
 
 
-def laplacian_filter(img, kernel=None):
+def laplacian_filter(img, kernel=None, workers=1, executor='thread', out=None, workspace=None,
+                     border=DEFAULT_BORDER, border_value=0):
+    factors = None
     if kernel is None:
-        kernel = LAPLACIAN_KERNEL
+        kernel, factors = get_kernel('laplacian')
     
-    laplacian = apply_convolution(img, kernel)
+    laplacian = apply_convolution(img, kernel, factors=factors, workers=workers, executor=executor,
+                                  out=out, workspace=workspace, border=border, border_value=border_value)
     return laplacian
 
 
-def sharpen_with_laplacian(img, c=1.0, kernel=None):
-    laplacian = laplacian_filter(img, kernel)
-    sharpened = img.astype(np.float32) + c * laplacian
-    return np.clip(sharpened, 0, 255).astype(np.uint8)
+def sharpen_with_laplacian(img, c=1.0, kernel=None, workers=1, executor='thread',
+                           out=None, workspace=None, border=DEFAULT_BORDER, border_value=0):
+    sharpened = laplacian_filter(img, kernel, workers, executor,
+                                 out=scratch(workspace, 'laplacian', img.shape), workspace=workspace,
+                                 border=border, border_value=border_value)
+    sharpened *= c
+    sharpened += img
+    return _clip_to_uint8(sharpened, out)
+
+
+DERIVATIVE_OUTPUTS = ('gx', 'gy', 'magnitude', 'laplacian')
+# Pixels per band in image_derivatives: small enough that a band's
+# intermediates stay in cache between the passes that share them.
+DERIVATIVE_BAND_PIXELS = 64 * 1024
 
 
-def sobel_gradient(img):
-    grad_x = apply_convolution(img, SOBEL_X_KERNEL)
-    grad_y = apply_convolution(img, SOBEL_Y_KERNEL)
+def image_derivatives(img, outputs=DERIVATIVE_OUTPUTS, l1=False, laplacian_kernel=None,
+                      workers=1, executor='thread', out=None, workspace=None,
+                      border=DEFAULT_BORDER, border_value=0):
+    # out: optional dict of preallocated float32 arrays, one per output name.
+    out = out or {}
+    unknown = set(outputs) - set(DERIVATIVE_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown derivative outputs: {sorted(unknown)}")
+    check_border(border)
+    
+    if laplacian_kernel is None:
+        laplacian_kernel = get_kernel('laplacian').kernel
+    laplacian_kernel = np.asarray(laplacian_kernel, dtype=np.float32)
+    
+    if workers != 1:
+        band_fn = partial(image_derivatives, outputs=outputs, l1=l1, laplacian_kernel=laplacian_kernel,
+                          border=border, border_value=border_value)
+        halo = max(1, laplacian_kernel.shape[0] // 2)
+        results = run_tiled(band_fn, img, halo, workers, executor, border, border_value)
+        return {name: into(out.get(name), value) for name, value in results.items()}
     
-    gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-    return gradient_magnitude
+    # One pass over the image: for each border region (the interior read in
+    # place, the edge strips gathered once), the Sobel column passes, the
+    # row passes, the magnitude and the Laplacian all read the same block,
+    # a band of rows at a time.
+    pad = max(1, laplacian_kernel.shape[0] // 2)
+    
+    if not np.can_cast(img.dtype, np.float32):
+        img = img.astype(np.float32)
+    results = {name: output(out.get(name), img.shape, np.float32) for name in outputs}
+    
+    for rows, cols, block in border_regions(img, pad, pad, border, border_value, np.float32):
+        band_rows = max(1, DERIVATIVE_BAND_PIXELS // (cols.stop - cols.start))
+        for start in range(rows.start, rows.stop, band_rows):
+            stop = min(start + band_rows, rows.stop)
+            band = block[..., start - rows.start:stop - rows.start + 2 * pad, :]
+            _derivative_band(band, slice(start, stop), cols, results, outputs, l1,
+                             laplacian_kernel, pad, workspace)
+    
+    return {name: results[name] for name in outputs}
+
 
+def _derivative_band(block, rows, cols, results, outputs, l1, laplacian_kernel, pad, workspace):
+    # block is laid out like the padded image (pad on each side) for the
+    # output rows/cols; every requested output is written into results.
+    smooth, derivative = get_kernel('sobel_x').factors
+    smooth_col, derivative_col = smooth.reshape(-1, 1), derivative.reshape(-1, 1)
+    smooth_row, derivative_row = smooth.reshape(1, -1), derivative.reshape(1, -1)
+    offset = pad - 1
+    need_gradient = 'magnitude' in outputs
+    
+    shape = block.shape[:-2] + (rows.stop - rows.start, cols.stop - cols.start)
+    h, w = shape[-2:]
+    # The 3x3 Sobel neighbourhood of the region, plus the extra column on
+    # each side that the row pass reads.
+    sobel = block[..., offset:offset+h+2, offset:offset+w+2]
+    column_shape = shape[:-1] + (w + 2,)
 
-def unsharp_masking(img, blur_size=5, k=1.0):
-    blurred = box_filter(img, blur_size)
+    def region(name):
+        # Requested outputs are written in place; gradients needed only
+        # for the magnitude live in scratch buffers.
+        if name in results:
+            return results[name][..., rows, cols]
+        return scratch(workspace, f'region_{name}', shape)
     
-    mask = img.astype(np.float32) - blurred.astype(np.float32)
+    if need_gradient or 'gx' in outputs:
+        smoothed = correlate_padded(sobel, smooth_col, column_shape,
+                                    scratch(workspace, 'sobel_smooth', column_shape), workspace)
+        grad_x = correlate_padded(smoothed, derivative_row, shape, region('gx'), workspace)
     
-    result = img.astype(np.float32) + k * mask
-    result = np.clip(result, 0, 255).astype(np.uint8)
+    if need_gradient or 'gy' in outputs:
+        differenced = correlate_padded(sobel, derivative_col, column_shape,
+                                       scratch(workspace, 'sobel_derivative', column_shape), workspace)
+        grad_y = correlate_padded(differenced, smooth_row, shape, region('gy'), workspace)
     
-    return blurred, mask, result
+    if need_gradient:
+        magnitude = results['magnitude'][..., rows, cols]
+        # The column pass is no longer needed; its buffer holds |gy| or gy².
+        other = differenced[..., :w]
+        if l1:
+            np.abs(grad_x, out=magnitude)
+            magnitude += np.abs(grad_y, out=other)
+        else:
+            np.multiply(grad_x, grad_x, out=magnitude)
+            magnitude += np.multiply(grad_y, grad_y, out=other)
+            np.sqrt(magnitude, out=magnitude)
+    
+    if 'laplacian' in outputs:
+        correlate_padded(block, laplacian_kernel, shape, results['laplacian'][..., rows, cols],
+                         workspace)
+
 
+def sobel_gradient(img, l1=False, workers=1, executor='thread', out=None, workspace=None,
+                   border=DEFAULT_BORDER, border_value=0):
+    return image_derivatives(img, ('magnitude',), l1, workers=workers, executor=executor,
+                             out={'magnitude': out}, workspace=workspace,
+                             border=border, border_value=border_value)['magnitude']
 
-def high_boost_filter(img, blur_size=5, A=1.5):
-    blurred = box_filter(img, blur_size)
-    result = A * img.astype(np.float32) - blurred.astype(np.float32)
+
+def unsharp_mask(img, blurred):
+    return img.astype(np.float32) - blurred.astype(np.float32)
+
+
+def add_mask(img, mask, k=1.0):
+    result = img.astype(np.float32) + k * mask
     return np.clip(result, 0, 255).astype(np.uint8)
 
 
-def mixed_spatial_enhancement(img, gamma=0.5):
-    steps = {}
-    steps['original'] = img
-    
-    laplacian = laplacian_filter(img)
-    steps['laplacian'] = laplacian
-    
-    sharpened = img.astype(np.float32) + laplacian
-    sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
-    steps['sharpened'] = sharpened
+def unsharp_masking(img, blur_size=5, k=1.0, workers=1):
+    blurred = box_filter(img, blur_size, workers=workers)
     
-    sobel_grad = sobel_gradient(img)
-    steps['sobel_gradient'] = sobel_grad
+    mask = unsharp_mask(img, blurred)
     
-    sobel_smoothed = box_filter(sobel_grad.astype(np.uint8), 5).astype(np.float32)
-    steps['sobel_smoothed'] = sobel_smoothed
+    result = add_mask(img, mask, k)
     
+    return blurred, mask, result
+
+
+def high_boost_filter(img, blur_size=5, A=1.5, workers=1, out=None, workspace=None):
+    blurred = box_filter(img, blur_size, workers=workers,
+                         out=scratch(workspace, 'blurred', img.shape, np.uint8), workspace=workspace)
+    result = scratch(workspace, 'boosted', img.shape)
+    np.copyto(result, img, casting='unsafe')
+    result *= A
+    result -= blurred
+    return _clip_to_uint8(result, out)
+
+
+def _smoothed_gradient(magnitude, size=5):
+    return box_filter(magnitude.astype(np.uint8), size).astype(np.float32)
+
+
+def _normalized_product(laplacian, gradient):
     laplacian_norm = (laplacian - laplacian.min()) / (laplacian.max() - laplacian.min() + 1e-10)
-    sobel_norm = (sobel_smoothed - sobel_smoothed.min()) / (sobel_smoothed.max() - sobel_smoothed.min() + 1e-10)
-    multiplied = laplacian_norm * sobel_norm * 255
-    steps['multiplied'] = multiplied
+    gradient_norm = (gradient - gradient.min()) / (gradient.max() - gradient.min() + 1e-10)
+    return laplacian_norm * gradient_norm * 255
+
+
+MIXED_ENHANCEMENT_STEPS = ('original', 'laplacian', 'sharpened', 'sobel_gradient', 'sobel_smoothed',
+                           'multiplied', 'added_to_original', 'final')
+
+
+def mixed_spatial_enhancement(img, gamma=0.5, outputs=None):
+    from src.transformations import gamma_correction
     
-    result_step6 = img.astype(np.float32) + multiplied
-    result_step6 = np.clip(result_step6, 0, 255).astype(np.uint8)
-    steps['added_to_original'] = result_step6
+    graph = Pipeline()
+    original = graph.input('original')
+    derivatives = graph.add(image_derivatives, original, ('laplacian', 'magnitude'))
     
-    from src.transformations import gamma_correction
-    final_result = gamma_correction(result_step6, gamma)
-    steps['final'] = final_result
+    steps = {}
+    steps['original'] = original
+    steps['laplacian'] = derivatives['laplacian']
+    steps['sharpened'] = graph.add(add_mask, original, steps['laplacian'])
+    steps['sobel_gradient'] = derivatives['magnitude']
+    steps['sobel_smoothed'] = graph.add(_smoothed_gradient, steps['sobel_gradient'])
+    steps['multiplied'] = graph.add(_normalized_product, steps['laplacian'], steps['sobel_smoothed'])
+    steps['added_to_original'] = graph.add(add_mask, original, steps['multiplied'])
+    steps['final'] = graph.add(gamma_correction, steps['added_to_original'], gamma)
     
-    return steps
+    # Only the requested steps are kept; everything else is freed as soon as
+    # the later steps no longer need it.
+    outputs = MIXED_ENHANCEMENT_STEPS if outputs is None else outputs
+    return graph.run({'original': img}, {name: steps[name] for name in outputs})
@@ -1,103 +1,236 @@
 import numpy as np
-from pathlib import Path
-import sys
-sys.path.append(str(Path(__file__).parent.parent))
+from functools import partial
+from src.utils import iter_window_histograms, window_fine_block
+from src.borders import DEFAULT_BORDER, check_border, pad_border, border_regions
+from src.tiling import run_tiled, map_row_bands
+
+# Above this window size the sliding-histogram rank beats direct comparison.
+LOCAL_HIST_COMPARE_MAX_WINDOW = 45
 
 
 def calculate_histogram(img):
-    hist, _ = np.histogram(img.flatten(), bins=256, range=[0, 256])
+    if img.dtype == np.uint8:
+        return np.bincount(img.ravel(), minlength=256)
+    
+    hist, _ = np.histogram(img.ravel(), bins=256, range=[0, 256])
     return hist
 
 
-def histogram_equalization(img):
-    hist, bins = np.histogram(img.flatten(), bins=256, range=[0, 256])
+def percentile_from_histogram(hist, q):
+    # Same linear interpolation as np.percentile on the pixels hist counts.
+    n = int(hist.sum())
+    cdf = np.cumsum(hist)
+    virtual = (np.float64(q) / 100) * (n - 1)
+    previous = np.floor(virtual)
+    t = virtual - previous
     
+    lo = int(previous)
+    hi = min(lo + 1, n - 1)
+    a = np.float64(np.searchsorted(cdf, lo, side='right'))
+    b = np.float64(np.searchsorted(cdf, hi, side='right'))
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def equalization_lut(hist):
     cdf = hist.cumsum()
     cdf_normalized = cdf / cdf[-1]
+    return (cdf_normalized * 255).astype(np.uint8)
+
+
+def histogram_equalization(img):
+    hist = calculate_histogram(img)
     
-    img_equalized = (cdf_normalized[img] * 255).astype(np.uint8)
+    cdf = hist.cumsum()
+    img_equalized = equalization_lut(hist)[img]
     
     return img_equalized, hist, cdf
 
 
-def local_histogram_equalization(img, window_size=3):
-    h, w = img.shape
+def _local_rank_by_compare(img, window_size, border=DEFAULT_BORDER, border_value=0):
+    # Windows inside the image are compared in place; only the border strips
+    # are gathered.
     pad = window_size // 2
-    img_padded = np.pad(img, pad, mode='reflect')
-    img_local_eq = np.zeros_like(img)
-    
-    for i in range(h):
-        for j in range(w):
-            window = img_padded[i:i+window_size, j:j+window_size]
-            
-            hist, _ = np.histogram(window.flatten(), bins=256, range=[0, 256])
-            cdf = hist.cumsum()
-            
-            if cdf[-1] > 0:
-                cdf_normalized = cdf / cdf[-1]
-            else:
-                cdf_normalized = cdf
-            
-            center_val = img[i, j]
-            img_local_eq[i, j] = (cdf_normalized[center_val] * 255).astype(np.uint8)
-    
-    return img_local_eq
-
-
-def histogram_matching(img, target_hist):
-    src_hist = calculate_histogram(img)
+    count = np.zeros(img.shape, dtype=np.int32)
+    for rows, cols, block in border_regions(img, pad, pad, border, border_value):
+        center = img[..., rows, cols]
+        region = count[..., rows, cols]
+        h, w = center.shape[-2:]
+        for di in range(window_size):
+            for dj in range(window_size):
+                region += block[..., di:di+h, dj:dj+w] <= center
+    return count
+
+
+def _local_rank_by_histogram(img, img_padded, window_size):
+    h, w = img.shape
+    out_cols = np.arange(w)
+    count = np.empty(img.shape, dtype=np.int32)
+    
+    windows = iter_window_histograms(img_padded, window_size, img.shape)
+    for i, (kernel_coarse, fine_blocks) in enumerate(windows):
+        center = img[i]
+        c = center >> 4
+        below = np.cumsum(kernel_coarse, axis=1)[out_cols, c] - kernel_coarse[out_cols, c]
+        fine = np.cumsum(window_fine_block(fine_blocks, c, window_size), axis=1)
+        count[i] = below + fine[out_cols, center & 15]
+    
+    return count
+
+
+def local_histogram_equalization(img, window_size=3, method='auto', workers=1, executor='thread',
+                                 border=DEFAULT_BORDER, border_value=0):
+    if method not in ('auto', 'compare', 'histogram'):
+        raise ValueError(f"Unknown local equalization method: {method}")
+    check_border(border)
+    
+    if workers != 1:
+        band_fn = partial(local_histogram_equalization, window_size=window_size, method=method,
+                          border=border, border_value=border_value)
+        return run_tiled(band_fn, img, window_size // 2, workers, executor, border, border_value)
+    
+    if method == 'auto':
+        use_histogram = img.dtype == np.uint8 and window_size > LOCAL_HIST_COMPARE_MAX_WINDOW
+        method = 'histogram' if use_histogram else 'compare'
+    elif method == 'histogram' and img.dtype != np.uint8:
+        raise ValueError("Method 'histogram' requires uint8 input")
+    
+    if img.ndim > 2 and method == 'histogram':
+        return np.stack([local_histogram_equalization(frame, window_size, method,
+                                                      border=border, border_value=border_value)
+                         for frame in img])
+    
+    if method == 'histogram':
+        img_padded = pad_border(img, window_size // 2, None, border, border_value)
+        count = _local_rank_by_histogram(img, img_padded, window_size)
+    else:
+        count = _local_rank_by_compare(img, window_size, border, border_value)
+    
+    cdf_normalized = count / (window_size * window_size)
+    return (cdf_normalized * 255).astype(np.uint8)
+
+
+def matching_lut(src_hist, target_hist):
     src_cdf = src_hist.cumsum()
     src_cdf = src_cdf / src_cdf[-1]
     
     target_cdf = target_hist.cumsum()
     target_cdf = target_cdf / target_cdf[-1]
     
-    mapping = np.zeros(256, dtype=np.uint8)
-    for i in range(256):
-        diff = np.abs(target_cdf - src_cdf[i])
-        mapping[i] = np.argmin(diff)
+    # Closest target CDF value for each source level, ties going to the
+    # lowest level (what argmin over |target_cdf - src_cdf[i]| picks).
+    upper = np.searchsorted(target_cdf, src_cdf, side='left')
+    lower = np.searchsorted(target_cdf, target_cdf[np.maximum(upper - 1, 0)], side='left')
+    
+    upper_clipped = np.minimum(upper, 255)
+    lower_diff = np.abs(target_cdf[lower] - src_cdf)
+    upper_diff = np.abs(target_cdf[upper_clipped] - src_cdf)
     
-    matched = mapping[img]
+    use_lower = (upper == 256) | ((upper > 0) & (lower_diff <= upper_diff))
+    mapping = np.where(use_lower, lower, upper_clipped)
+    return mapping.astype(np.uint8)
+
+
+def histogram_matching(img, target_hist=None, reference=None):
+    if (target_hist is None) == (reference is None):
+        raise ValueError("Pass exactly one of target_hist or reference")
+    
+    if reference is not None:
+        target_hist = calculate_histogram(reference)
+    
+    src_hist = calculate_histogram(img)
+    matched = matching_lut(src_hist, target_hist)[img]
     return matched
 
 
-def adaptive_histogram_equalization(img, clip_limit=2.0, grid_size=(8, 8)):
+def _tile_edges(length, tiles):
+    step = length // tiles
+    return np.array([k * step for k in range(tiles)] + [length])
+
+
+def _clipped_tile_luts(img, y_edges, x_edges, clip_limit):
+    grid_h, grid_w = len(y_edges) - 1, len(x_edges) - 1
+    row_tile = np.repeat(np.arange(grid_h), np.diff(y_edges))
+    col_tile = np.repeat(np.arange(grid_w), np.diff(x_edges))
+    
+    tile_ids = row_tile[:, None] * grid_w + col_tile[None, :]
+    hist = np.bincount((tile_ids * 256 + img).ravel(), minlength=grid_h * grid_w * 256)
+    hist = hist.reshape(grid_h * grid_w, 256).astype(np.float64)
+    
+    clip_val = clip_limit * hist.mean(axis=1, keepdims=True)
+    excess = np.maximum(hist - clip_val, 0).sum(axis=1, keepdims=True)
+    hist = np.minimum(hist, clip_val) + excess / 256
+    
+    cdf = hist.cumsum(axis=1)
+    total = cdf[:, -1:]
+    luts = np.divide(cdf, total, out=np.zeros_like(cdf), where=total > 0) * 255
+    return luts.astype(np.float32), tile_ids
+
+
+def _interpolation_weights(edges, length):
+    centers = (edges[:-1] + edges[1:] - 1) / 2
+    pos = np.arange(length)
+    
+    if len(centers) == 1:
+        zeros = np.zeros(length, dtype=np.intp)
+        return zeros, zeros, np.zeros(length, dtype=np.float32)
+    
+    lower = np.clip(np.searchsorted(centers, pos, side='right') - 1, 0, len(centers) - 2)
+    weight = (pos - centers[lower]) / (centers[lower + 1] - centers[lower])
+    return lower, lower + 1, np.clip(weight, 0, 1).astype(np.float32)
+
+
+def _clahe_rows(img, lut_flat, grid_w, y_weights, x_weights, start, stop):
+    top, bottom, wy = (a[start:stop] for a in y_weights)
+    left, right, wx = x_weights
+    
+    base = img[start:stop].astype(np.int32)
+    top_row = (top * grid_w * 256).astype(np.int32)[:, None]
+    bottom_row = (bottom * grid_w * 256).astype(np.int32)[:, None]
+    left_col = base + (left * 256).astype(np.int32)[None, :]
+    right_col = base + (right * 256).astype(np.int32)[None, :]
+    
+    top_left = lut_flat[top_row + left_col]
+    upper = lut_flat[top_row + right_col]
+    upper -= top_left
+    upper *= wx[None, :]
+    upper += top_left
+    
+    bottom_left = lut_flat[bottom_row + left_col]
+    lower = lut_flat[bottom_row + right_col]
+    lower -= bottom_left
+    lower *= wx[None, :]
+    lower += bottom_left
+    
+    lower -= upper
+    lower *= wy[:, None]
+    upper += lower
+    return np.clip(upper, 0, 255).astype(np.uint8)
+
+
+def adaptive_histogram_equalization(img, clip_limit=2.0, grid_size=(8, 8), method='clahe',
+                                    workers=1, executor='thread'):
+    if method not in ('clahe', 'tiles'):
+        raise ValueError(f"Unknown adaptive equalization method: {method}")
+    
     h, w = img.shape
-    grid_h, grid_w = grid_size
-    
-    tile_h = h // grid_h
-    tile_w = w // grid_w
-    
-    result = np.zeros_like(img)
-    
-    for i in range(grid_h):
-        for j in range(grid_w):
-            y_start = i * tile_h
-            y_end = (i + 1) * tile_h if i < grid_h - 1 else h
-            x_start = j * tile_w
-            x_end = (j + 1) * tile_w if j < grid_w - 1 else w
-            
-            tile = img[y_start:y_end, x_start:x_end]
-            
-            hist = calculate_histogram(tile)
-            
-            clip_val = clip_limit * hist.mean()
-            excess = 0
-            for k in range(256):
-                if hist[k] > clip_val:
-                    excess += hist[k] - clip_val
-                    hist[k] = clip_val
-            
-            bonus = excess // 256
-            hist += bonus
-            
-            cdf = hist.cumsum()
-            if cdf[-1] > 0:
-                cdf = cdf / cdf[-1]
-                tile_eq = (cdf[tile] * 255).astype(np.uint8)
-            else:
-                tile_eq = tile
-            
-            result[y_start:y_end, x_start:x_end] = tile_eq
-    
-    return result
+    # At most one tile per row/column: empty tiles would have all-zero LUTs
+    # that the blend still mixes in.
+    grid_h, grid_w = min(grid_size[0], h), min(grid_size[1], w)
+    y_edges = _tile_edges(h, grid_h)
+    x_edges = _tile_edges(w, grid_w)
+    
+    luts, tile_ids = _clipped_tile_luts(img, y_edges, x_edges, clip_limit)
+    lut_flat = luts.ravel()
+    
+    # 'tiles' maps each tile with its own LUT, without blending. It matches
+    # the original per-tile loop only when nothing is clipped: that loop
+    # truncated the clip limit into an integer histogram.
+    if method == 'tiles':
+        return lut_flat[tile_ids * 256 + img].astype(np.uint8)
+    
+    y_weights = _interpolation_weights(y_edges, h)
+    x_weights = _interpolation_weights(x_edges, w)
+    
+    rows_fn = partial(_clahe_rows, img, lut_flat, grid_w, y_weights, x_weights)
+    return map_row_bands(rows_fn, h, workers, executor)
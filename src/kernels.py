@@ -0,0 +1,76 @@
+import numpy as np
+from collections import namedtuple
+from functools import lru_cache
+from config import LAPLACIAN_KERNEL, SOBEL_X_KERNEL, SOBEL_Y_KERNEL, SOBEL_SMOOTH_1D, SOBEL_DERIVATIVE_1D
+
+# kernel: the 2D correlation kernel. factors: (column, row) 1D kernels whose
+# outer product is `kernel`, or False when the kernel is not separable (so
+# callers can skip the separability test as well).
+Kernel = namedtuple('Kernel', ['kernel', 'factors'])
+
+KERNEL_TYPES = ('box', 'gaussian', 'laplacian', 'sobel_x', 'sobel_y')
+
+
+def _frozen(values, dtype):
+    array = np.ascontiguousarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def _box_1d(size):
+    return np.full(size, 1.0 / size, dtype=np.float32)
+
+
+def _gaussian_1d(size, sigma):
+    x = np.arange(size, dtype=np.float32) - size // 2
+    kernel = np.exp(-(x**2) / (2 * sigma**2))
+    return (kernel / np.sum(kernel)).astype(np.float32)
+
+
+def _separable(col, row, dtype):
+    col = _frozen(col, dtype)
+    row = _frozen(row, dtype)
+    return Kernel(_frozen(np.outer(col, row), dtype), (col, row))
+
+
+@lru_cache(maxsize=None)
+def _build_kernel(kind, size, sigma, dtype):
+    if kind == 'box':
+        k1 = _box_1d(size)
+        return _separable(k1, k1, dtype)
+    if kind == 'gaussian':
+        k1 = _gaussian_1d(size, sigma)
+        return _separable(k1, k1, dtype)
+    if kind == 'laplacian':
+        return Kernel(_frozen(LAPLACIAN_KERNEL, dtype), False)
+    if kind == 'sobel_x':
+        kernel = _separable(SOBEL_SMOOTH_1D, SOBEL_DERIVATIVE_1D, dtype)
+        return kernel._replace(kernel=_frozen(SOBEL_X_KERNEL, dtype))
+    if kind == 'sobel_y':
+        kernel = _separable(SOBEL_DERIVATIVE_1D, SOBEL_SMOOTH_1D, dtype)
+        return kernel._replace(kernel=_frozen(SOBEL_Y_KERNEL, dtype))
+    raise ValueError(f"Unknown kernel type: {kind}")
+
+
+def get_kernel(kind, size=3, sigma=None, dtype=np.float32):
+    # Every (type, size, sigma, dtype) is built once; the arrays handed out
+    # are shared and read-only.
+    if kind not in KERNEL_TYPES:
+        raise ValueError(f"Unknown kernel type: {kind}")
+    if kind == 'gaussian':
+        if sigma is None:
+            raise ValueError("Gaussian kernels need a sigma")
+        sigma = float(sigma)
+    else:
+        sigma = None
+    if kind in ('laplacian', 'sobel_x', 'sobel_y'):
+        size = 3
+    return _build_kernel(kind, int(size), sigma, np.dtype(dtype).name)
+
+
+def kernel_bank_info():
+    return _build_kernel.cache_info()
+
+
+def clear_kernel_bank():
+    _build_kernel.cache_clear()
@@ -0,0 +1,138 @@
+import hashlib
+import inspect
+import operator
+import numpy as np
+
+
+class Node:
+    def __init__(self, pipeline, index, fn, args, kwargs, name):
+        self.pipeline = pipeline
+        self.index = index
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+
+    @property
+    def dependencies(self):
+        values = list(self.args) + list(self.kwargs.values())
+        seen = {}
+        for value in values:
+            if isinstance(value, Node):
+                seen.setdefault(value.index, value)
+        return list(seen.values())
+
+    def __getitem__(self, key):
+        # Pick one output of a stage that returns a tuple or dict.
+        return self.pipeline.add(operator.getitem, self, key)
+
+    def __repr__(self):
+        return f"Node({self.name})"
+
+
+def _freeze(value):
+    if isinstance(value, Node):
+        return ('node', value.index)
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(value).view(np.uint8)).hexdigest()
+        return ('array', value.shape, value.dtype.str, digest)
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return ('repr', repr(value))
+    return (type(value).__name__, value)
+
+
+def _bind(fn, args, kwargs):
+    # Normalise positional/keyword/default spellings of the same call so
+    # box_filter(img, 5) and box_filter(img, size=5) share one node.
+    try:
+        bound = inspect.signature(fn).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return args, kwargs
+    bound.apply_defaults()
+    return bound.args, bound.kwargs
+
+
+class Pipeline:
+    # A DAG of stages. Identical stages (same function, same inputs, same
+    # parameters) are merged when added, so each is computed once per run.
+    # run() evaluates only what the requested outputs need and drops every
+    # intermediate as soon as its last consumer has run.
+    def __init__(self):
+        self.nodes = []
+        self._index = {}
+
+    def input(self, name):
+        key = ('input', name)
+        if key not in self._index:
+            node = Node(self, len(self.nodes), None, (), {}, name)
+            self.nodes.append(node)
+            self._index[key] = node
+        return self._index[key]
+
+    def add(self, fn, *args, **kwargs):
+        # Keyed on the normalised call, but run as written: defaults filled
+        # in by binding are not always accepted back (ufuncs, for one).
+        bound_args, bound_kwargs = _bind(fn, args, kwargs)
+        key = (fn, _freeze(bound_args), _freeze(bound_kwargs))
+        if key not in self._index:
+            name = getattr(fn, '__name__', repr(fn))
+            node = Node(self, len(self.nodes), fn, args, kwargs, name)
+            self.nodes.append(node)
+            self._index[key] = node
+        return self._index[key]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _required(self, targets):
+        required = set()
+        stack = list(targets)
+        while stack:
+            node = stack.pop()
+            if node.index not in required:
+                required.add(node.index)
+                stack.extend(node.dependencies)
+        return sorted(required)
+
+    def run(self, inputs, outputs):
+        if isinstance(outputs, Node):
+            return self.run(inputs, {'result': outputs})['result']
+        if not isinstance(outputs, dict):
+            outputs = {node.name: node for node in outputs}
+        
+        order = self._required(outputs.values())
+        keep = {node.index for node in outputs.values()}
+        
+        consumers = dict.fromkeys(order, 0)
+        for index in order:
+            for dep in self.nodes[index].dependencies:
+                consumers[dep.index] += 1
+        
+        values = {}
+        for index in order:
+            node = self.nodes[index]
+            if node.fn is None:
+                if node.name not in inputs:
+                    raise ValueError(f"Missing pipeline input '{node.name}'")
+                values[index] = inputs[node.name]
+                continue
+
+            def resolve(value):
+                return values[value.index] if isinstance(value, Node) else value
+            
+            args = [resolve(value) for value in node.args]
+            kwargs = {key: resolve(value) for key, value in node.kwargs.items()}
+            values[index] = node.fn(*args, **kwargs)
+            
+            for dep in node.dependencies:
+                consumers[dep.index] -= 1
+                if consumers[dep.index] == 0 and dep.index not in keep:
+                    del values[dep.index]
+        
+        return {name: values[node.index] for name, node in outputs.items()}
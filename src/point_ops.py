@@ -0,0 +1,131 @@
+import numpy as np
+from src.transformations import (
+    LUT_INPUT, negative_lut, log_lut, gamma_lut, contrast_stretching_lut,
+    default_log_constant, default_stretch_points
+)
+from src.histogram import (
+    calculate_histogram, equalization_lut, matching_lut, percentile_from_histogram
+)
+
+
+class PointOp:
+    # A uint8 -> uint8 intensity mapping. Fixed ops carry their 256-entry
+    # table; adaptive ops (equalization, matching, default log/contrast
+    # parameters) build it from the histogram of whatever reaches them.
+    def __init__(self, lut=None, lut_from_histogram=None, name='point_op'):
+        if (lut is None) == (lut_from_histogram is None):
+            raise ValueError("PointOp needs exactly one of lut or lut_from_histogram")
+        
+        if lut is not None:
+            lut = np.ascontiguousarray(lut, dtype=np.uint8)
+            if lut.shape != (256,):
+                raise ValueError(f"LUT must have 256 entries, got shape {lut.shape}")
+            lut.setflags(write=False)
+        
+        self.lut = lut
+        self.lut_from_histogram = lut_from_histogram
+        self.name = name
+
+    @property
+    def adaptive(self):
+        return self.lut is None
+
+    def table(self, hist=None):
+        if self.lut is not None:
+            return self.lut
+        if hist is None:
+            raise ValueError(f"{self.name} needs the histogram of its input")
+        return self.lut_from_histogram(hist)
+
+    def __rshift__(self, other):
+        return PointChain([self, other])
+
+    def __call__(self, img):
+        return PointChain([self])(img)
+
+    def __repr__(self):
+        return f"PointOp({self.name})"
+
+
+class PointChain:
+    def __init__(self, ops):
+        self.ops = []
+        for op in ops:
+            self.ops.extend(op.ops if isinstance(op, PointChain) else [op])
+
+    def __rshift__(self, other):
+        return PointChain([self, other])
+
+    @property
+    def adaptive(self):
+        return any(op.adaptive for op in self.ops)
+
+    def compile(self, img=None, hist=None):
+        lut = LUT_INPUT
+        base_hist = hist
+        
+        for op in self.ops:
+            stage_hist = None
+            if op.adaptive:
+                if base_hist is None:
+                    if img is None:
+                        raise ValueError("Adaptive point chains need an image or histogram to compile")
+                    base_hist = calculate_histogram(img)
+                stage_hist = np.bincount(lut, weights=base_hist, minlength=256).astype(np.int64)
+            lut = op.table(stage_hist)[lut]
+        
+        return PointOp(lut, name=' >> '.join(op.name for op in self.ops))
+
+    def __call__(self, img):
+        if img.dtype != np.uint8:
+            raise ValueError("Point chains operate on uint8 images")
+        return self.compile(img).lut[img]
+
+    def __repr__(self):
+        return f"PointChain({' >> '.join(op.name for op in self.ops)})"
+
+
+def lut_op(lut, name='lut'):
+    return PointOp(lut, name=name)
+
+
+def negative_op():
+    return PointOp(negative_lut(), name='negative')
+
+
+def log_op(c=None):
+    if c is not None:
+        return PointOp(log_lut(c), name=f'log(c={c})')
+
+    def from_histogram(hist):
+        return log_lut(default_log_constant(np.flatnonzero(hist)[-1]))
+    
+    return PointOp(lut_from_histogram=from_histogram, name='log')
+
+
+def gamma_op(gamma=1.0):
+    return PointOp(gamma_lut(float(gamma)), name=f'gamma({gamma})')
+
+
+def contrast_stretching_op(r1=None, s1=None, r2=None, s2=None):
+    if r1 is not None and r2 is not None:
+        return PointOp(contrast_stretching_lut(*default_stretch_points(None, r1, s1, r2, s2)),
+                       name='contrast_stretching')
+
+    def from_histogram(hist):
+        low = percentile_from_histogram(hist, 5)
+        high = percentile_from_histogram(hist, 95)
+        return contrast_stretching_lut(*default_stretch_points(None, low, s1, high, s2))
+    
+    return PointOp(lut_from_histogram=from_histogram, name='contrast_stretching')
+
+
+def equalization_op():
+    return PointOp(lut_from_histogram=equalization_lut, name='equalization')
+
+
+def matching_op(target_hist):
+    def from_histogram(hist):
+        return matching_lut(hist, target_hist)
+    
+    return PointOp(lut_from_histogram=from_histogram, name='matching')
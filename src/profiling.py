@@ -0,0 +1,389 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+import numpy as np
+
+# One call into an instrumented function. start/wall/cpu are seconds
+# (start relative to the profiler's start); peak_bytes is the most memory the
+# call had allocated at once, net_bytes what was still allocated on return
+# (mostly its result). parent is the index of the enclosing call in the same
+# thread, run the label of the enclosing Profiler.run() block.
+CallRecord = namedtuple('CallRecord', [
+    'index', 'name', 'parent', 'depth', 'thread', 'run', 'start', 'wall', 'cpu',
+    'peak_bytes', 'net_bytes', 'inputs', 'outputs'
+])
+
+# Methods instrumented alongside the module-level functions.
+METHODS = [
+    ('src.pipeline', 'Pipeline', 'run'),
+    ('src.point_ops', 'PointOp', '__call__'),
+    ('src.point_ops', 'PointChain', '__call__'),
+]
+
+_active = None
+
+
+def _shapes(value):
+    if isinstance(value, np.ndarray):
+        return list(value.shape)
+    if isinstance(value, (tuple, list)):
+        shapes = [_shapes(v) for v in value]
+        return shapes if any(s is not None for s in shapes) else None
+    if isinstance(value, dict):
+        shapes = {str(k): _shapes(v) for k, v in value.items()}
+        return {k: s for k, s in shapes.items() if s is not None} or None
+    return None
+
+
+def _input_shapes(args, kwargs):
+    shapes = [_shapes(v) for v in list(args) + list(kwargs.values())]
+    return [s for s in shapes if s is not None]
+
+
+class _Frame:
+    def __init__(self, index, start_bytes):
+        self.index = index
+        self.start_bytes = start_bytes
+        self.peak = start_bytes
+
+
+class Profiler:
+    # Opt-in instrumentation. While a profiler is active (inside `with`), the
+    # functions of every loaded src module are swapped for timing wrappers in
+    # each namespace that refers to them (the src modules themselves, __main__
+    # and any extra `modules`), and swapped back on exit, so nothing is paid
+    # when profiling is off. Names bound before entering elsewhere, e.g.
+    # `from src import box_filter` in another module, are only covered when
+    # that module is passed in `modules`.
+    #
+    # Memory is measured with tracemalloc, which is process-wide: calls running
+    # concurrently in worker threads see each other's allocations.
+    def __init__(self, memory=True, private=False, modules=()):
+        self.memory = memory
+        self.private = private
+        self.modules = list(modules)
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._run = None
+        self._spans = set()
+        self._patched = []
+        self._wrappers = {}
+        self._started_tracing = False
+        self._origin = None
+        self._depth = 0
+
+    def __enter__(self):
+        global _active
+        if _active is self:
+            self._depth += 1
+            return self
+        if _active is not None:
+            raise ValueError("Another profiler is already active")
+        
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self._origin is None:
+            self._origin = time.perf_counter()
+        self._install()
+        _active = self
+        self._depth = 1
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        self._depth -= 1
+        if self._depth:
+            return False
+        _active = None
+        self._uninstall()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def _namespaces(self):
+        names = [name for name in sys.modules
+                 if (name == 'src' or name.startswith('src.')) and name != __name__]
+        namespaces = [sys.modules[name] for name in names]
+        if '__main__' in sys.modules:
+            namespaces.append(sys.modules['__main__'])
+        return namespaces + self.modules
+
+    def _targets(self):
+        targets = {}
+        for name, module in list(sys.modules.items()):
+            if not name.startswith('src.') or name == __name__:
+                continue
+            for attr, value in vars(module).items():
+                if attr.startswith('__') or (attr.startswith('_') and not self.private):
+                    continue
+                if (callable(value) and not isinstance(value, type)
+                        and getattr(value, '__module__', None) == name):
+                    targets[id(value)] = value
+        return targets
+
+    def _install(self):
+        # The package imports its submodules lazily; load them all first so
+        # every function can be wrapped.
+        import src
+        for name in src.__all__:
+            getattr(src, name)
+        
+        wrappers = {key: self.wrap(fn) for key, fn in self._targets().items()}
+        self._wrappers = {id(wrapper): wrapper.__wrapped__ for wrapper in wrappers.values()}
+        for namespace in self._namespaces():
+            for attr, value in list(vars(namespace).items()):
+                wrapper = wrappers.get(id(value))
+                if wrapper is not None and value is not wrapper:
+                    setattr(namespace, attr, wrapper)
+                    self._patched.append((namespace, attr, value))
+        
+        for module_name, class_name, method in METHODS:
+            module = sys.modules.get(module_name)
+            cls = getattr(module, class_name, None)
+            if cls is not None and method in vars(cls):
+                original = vars(cls)[method]
+                setattr(cls, method, self.wrap(original, f"{class_name}.{method}"))
+                self._patched.append((cls, method, original))
+
+    def _uninstall(self):
+        for namespace, attr, original in reversed(self._patched):
+            setattr(namespace, attr, original)
+        self._patched = []
+        
+        # Wrappers picked up while active (e.g. a name bound by
+        # `from src.filters import box_filter` inside the block).
+        for namespace in self._namespaces():
+            for attr, value in list(vars(namespace).items()):
+                original = self._wrappers.get(id(value))
+                if original is not None and getattr(value, '__wrapped__', None) is original:
+                    setattr(namespace, attr, original)
+        self._wrappers = {}
+
+    def wrap(self, fn, name=None):
+        name = name or getattr(fn, '__name__', repr(fn))
+
+        @wraps(fn)
+        def instrumented(*args, **kwargs):
+            with self.span(name, args, kwargs) as span:
+                result = fn(*args, **kwargs)
+                span['outputs'] = _shapes(result)
+            return result
+        return instrumented
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _traced(self):
+        return self.memory and tracemalloc.is_tracing()
+
+    @contextmanager
+    def span(self, name, args=(), kwargs=None):
+        # Records one call. Also usable directly around any block of code.
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        
+        with self._lock:
+            index = len(self.records)
+            self.records.append(None)
+        
+        start_bytes = 0
+        if self._traced():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.peak = max(parent.peak, peak)
+            tracemalloc.reset_peak()
+            start_bytes = current
+        
+        frame = _Frame(index, start_bytes)
+        stack.append(frame)
+        details = {'index': index, 'outputs': None}
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield details
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+            stack.pop()
+            
+            peak_bytes = net_bytes = 0
+            if self._traced():
+                current, peak = tracemalloc.get_traced_memory()
+                frame.peak = max(frame.peak, peak)
+                if parent is not None:
+                    parent.peak = max(parent.peak, frame.peak)
+                peak_bytes = frame.peak - start_bytes
+                net_bytes = current - start_bytes
+            
+            self.records[index] = CallRecord(
+                index, name, parent.index if parent is not None else None, len(stack),
+                threading.get_ident(), self._run, start - self._origin, wall, cpu,
+                peak_bytes, net_bytes, _input_shapes(args, kwargs or {}), details['outputs'])
+
+    @contextmanager
+    def run(self, label):
+        # Groups every call made inside the block (in any thread) under
+        # `label`, and records the block itself as a span of that name.
+        previous = self._run
+        self._run = label
+        try:
+            with self, self.span(label) as span:
+                self._spans.add(span['index'])
+                yield self
+        finally:
+            self._run = previous
+
+    def clear(self):
+        self.records = []
+
+    def calls(self):
+        return [record for record in self.records if record is not None]
+
+    def _self_times(self, records):
+        own = {record.index: record.wall for record in records}
+        for record in records:
+            if record.parent in own:
+                own[record.parent] -= record.wall
+        return own
+
+    def summary(self, by='function'):
+        # by='function': call count, total/self/mean wall time, CPU time and
+        # the largest peak allocation per function; self time excludes
+        # instrumented calls made from inside it. by='run': the same for each
+        # Profiler.run() label, taken from the run blocks themselves, with
+        # calls counting the instrumented calls made inside them.
+        if by not in ('function', 'run'):
+            raise ValueError(f"Unknown summary grouping: {by}")
+        records = self.calls()
+        own = self._self_times(records)
+        
+        groups = {}
+
+        def add(key, record):
+            row = groups.setdefault(key, {'calls': 0, 'wall': 0.0, 'self': 0.0, 'cpu': 0.0,
+                                          'peak_bytes': 0})
+            row['wall'] += record.wall
+            row['self'] += own[record.index]
+            row['cpu'] += record.cpu
+            row['peak_bytes'] = max(row['peak_bytes'], record.peak_bytes)
+            return row
+        
+        for record in records:
+            if by == 'function' and record.index not in self._spans:
+                add(record.name, record)['calls'] += 1
+            elif by == 'run' and record.index in self._spans:
+                row = add(record.run, record)
+                row['runs'] = row.get('runs', 0) + 1
+        
+        if by == 'run':
+            for record in records:
+                if record.run in groups and record.index not in self._spans:
+                    groups[record.run]['calls'] += 1
+            for row in groups.values():
+                row['mean'] = row['wall'] / row['runs']
+        else:
+            for row in groups.values():
+                row['mean'] = row['wall'] / row['calls']
+        return groups
+
+    def table(self, by='function', sort='self', limit=None):
+        groups = self.summary(by)
+        rows = sorted(groups.items(), key=lambda item: -item[1][sort])[:limit]
+        label = 'function' if by == 'function' else 'run'
+        lines = [f"{label:<36} {'calls':>7} {'total ms':>11} {'self ms':>11} {'mean ms':>10} "
+                 f"{'cpu ms':>11} {'peak MB':>9}"]
+        for key, row in rows:
+            lines.append(f"{str(key):<36} {row['calls']:>7} {row['wall'] * 1000:>11.2f} "
+                         f"{row['self'] * 1000:>11.2f} {row['mean'] * 1000:>10.3f} "
+                         f"{row['cpu'] * 1000:>11.2f} {row['peak_bytes'] / 1e6:>9.2f}")
+        return '\n'.join(lines)
+
+    def to_json(self, path=None):
+        data = {
+            'calls': [record._asdict() for record in self.calls()],
+            'functions': self.summary('function'),
+            'runs': {str(key): row for key, row in self.summary('run').items()},
+        }
+        if path is not None:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(data, indent=2))
+        return data
+
+    def to_chrome_trace(self, path=None):
+        # Complete ("X") events in microseconds; open in chrome://tracing or
+        # https://ui.perfetto.dev.
+        pid = os.getpid()
+        events = []
+        for record in self.calls():
+            events.append({
+                'name': record.name,
+                'cat': record.run or 'src',
+                'ph': 'X',
+                'ts': record.start * 1e6,
+                'dur': record.wall * 1e6,
+                'pid': pid,
+                'tid': record.thread,
+                'args': {
+                    'cpu_ms': record.cpu * 1000,
+                    'peak_bytes': record.peak_bytes,
+                    'net_bytes': record.net_bytes,
+                    'inputs': record.inputs,
+                    'outputs': record.outputs,
+                },
+            })
+        data = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        if path is not None:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(data))
+        return data
+
+
+def active_profiler():
+    return _active
+
+
+def profiled(fn=None, name=None):
+    # Decorator for functions outside src (task runners, scripts): recorded
+    # when a profiler is active, a plain call otherwise.
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return fn(*args, **kwargs)
+            with profiler.span(label, args, kwargs) as span:
+                result = fn(*args, **kwargs)
+                span['outputs'] = _shapes(result)
+            return result
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+
+@contextmanager
+def profile(label=None, **options):
+    # with profile() as prof: ...; print(prof.table())
+    profiler = Profiler(**options)
+    if label is None:
+        with profiler:
+            yield profiler
+    else:
+        with profiler.run(label):
+            yield profiler
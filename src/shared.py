@@ -0,0 +1,151 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Picklable handle to an array in a shared-memory block: this is what goes
+# to and comes back from worker processes instead of the pixels.
+SharedArray = namedtuple('SharedArray', ['name', 'shape', 'dtype'])
+
+
+def _create(shape, dtype):
+    dtype = np.dtype(dtype)
+    nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    block = shared_memory.SharedMemory(create=True, size=nbytes)
+    return block, SharedArray(block.name, tuple(shape), dtype.str)
+
+
+def _view(block, ref):
+    return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=block.buf)
+
+
+class SharedImageStore:
+    # Owns shared-memory blocks on the parent side. put() copies an image in
+    # once; any number of worker processes then attach() to it by handle
+    # without decoding or unpickling it. Workers hand results back with
+    # share(), and the parent takes ownership with adopt(). Every block the
+    # store owns is unlinked by release() or close().
+    def __init__(self):
+        self._blocks = {}
+        self._loaded = {}
+
+    def _own(self, block, ref):
+        self._blocks[ref.name] = block
+        return ref
+
+    def put(self, img):
+        img = np.asarray(img)
+        block, ref = _create(img.shape, img.dtype)
+        _view(block, ref)[...] = img
+        return self._own(block, ref)
+
+    def empty(self, shape, dtype=np.uint8):
+        # An output buffer for workers to fill in place through attach().
+        return self._own(*_create(shape, dtype))
+
+    def load(self, filename, grayscale=True):
+        # Decodes (through the image cache) and shares each file once.
+        key = (filename, grayscale)
+        if key not in self._loaded:
+            from src.utils import _cached_image
+            img = _cached_image(filename, grayscale)
+            if img is None:
+                img = np.zeros((256, 256), dtype=np.uint8)
+            self._loaded[key] = self.put(img)
+        return self._loaded[key]
+
+    def array(self, ref):
+        return _view(self._blocks[ref.name], ref)
+
+    def adopt(self, ref):
+        # Takes ownership of a block a worker created with share().
+        if ref.name not in self._blocks:
+            self._blocks[ref.name] = shared_memory.SharedMemory(name=ref.name)
+        return self.array(ref)
+
+    def release(self, ref):
+        self._release(ref.name)
+
+    def _release(self, name):
+        block = self._blocks.pop(name, None)
+        if block is None:
+            return
+        self._loaded = {k: v for k, v in self._loaded.items() if v.name != name}
+        try:
+            block.close()
+        except BufferError:
+            # Views are still alive; the mapping goes away with them.
+            pass
+        block.unlink()
+
+    def close(self):
+        for name in list(self._blocks):
+            self._release(name)
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self._blocks.values())
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+@contextmanager
+def attached(ref):
+    # Worker side: the shared array for a handle, valid inside the block.
+    # Copy anything that must outlive it (share() does).
+    block = shared_memory.SharedMemory(name=ref.name)
+    try:
+        yield _view(block, ref)
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+
+def share(value):
+    # Worker side: copies a result (an array, or a dict/tuple/list of
+    # arrays) into new shared blocks and returns handles in the same
+    # structure, for the parent to adopt().
+    if isinstance(value, np.ndarray):
+        block, ref = _create(value.shape, value.dtype)
+        _view(block, ref)[...] = value
+        block.close()
+        return ref
+    if isinstance(value, dict):
+        return {key: share(v) for key, v in value.items()}
+    if isinstance(value, (tuple, list)) and not isinstance(value, SharedArray):
+        return type(value)(share(v) for v in value)
+    return value
+
+
+def adopt(store, value):
+    # Parent side counterpart of share(): handles back to arrays owned by
+    # the store.
+    if isinstance(value, SharedArray):
+        return store.adopt(value)
+    if isinstance(value, dict):
+        return {key: adopt(store, v) for key, v in value.items()}
+    if isinstance(value, (tuple, list)):
+        return type(value)(adopt(store, v) for v in value)
+    return value
+
+
+def release(store, value):
+    if isinstance(value, SharedArray):
+        store.release(value)
+    elif isinstance(value, dict):
+        for v in value.values():
+            release(store, v)
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            release(store, v)
@@ -0,0 +1,140 @@
+import numpy as np
+from pathlib import Path
+
+from src.borders import DEFAULT_BORDER, check_border, border_index
+
+RAW_SUFFIXES = ('.raw', '.bin')
+TIFF_SUFFIXES = ('.tif', '.tiff')
+
+
+def _import_tifffile():
+    try:
+        import tifffile
+    except ImportError as e:
+        raise ImportError("Streaming TIFF files requires the 'tifffile' package") from e
+    return tifffile
+
+
+def open_image_source(path, shape=None, dtype=np.uint8, offset=0):
+    path = Path(path)
+    suffix = path.suffix.lower()
+    
+    if suffix == '.npy':
+        return np.load(path, mmap_mode='r')
+    
+    if suffix in RAW_SUFFIXES:
+        if shape is None:
+            raise ValueError("Raw input needs an explicit shape")
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+    
+    if suffix in TIFF_SUFFIXES:
+        tifffile = _import_tifffile()
+        try:
+            return tifffile.memmap(path, mode='r')
+        except ValueError:
+            # Compressed or non-contiguous TIFF: decode chunk by chunk through
+            # a zarr view instead of mapping the file directly.
+            import zarr
+            return zarr.open(tifffile.imread(path, aszarr=True), mode='r')
+    
+    raise ValueError(f"Unsupported streaming input format: {path.suffix}")
+
+
+def open_image_sink(path, shape, dtype):
+    path = Path(path)
+    suffix = path.suffix.lower()
+    shape = tuple(shape)
+    
+    if suffix == '.npy':
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    
+    if suffix in RAW_SUFFIXES:
+        return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    
+    if suffix in TIFF_SUFFIXES:
+        tifffile = _import_tifffile()
+        return tifffile.memmap(path, shape=shape, dtype=dtype)
+    
+    raise ValueError(f"Unsupported streaming output format: {path.suffix}")
+
+
+def read_strips(source, strip_rows=256):
+    height = source.shape[0]
+    for start in range(0, height, strip_rows):
+        yield np.asarray(source[start:start + strip_rows])
+
+
+def _rows_with_halo(buffer, buffer_start, height, start, stop, halo, border=DEFAULT_BORDER,
+                    border_value=0):
+    # Same rows band_with_halo would cut from the full image, taken from a
+    # rolling buffer that holds rows [buffer_start, buffer_start + len(buffer)).
+    # Rows past the top/bottom edge come through the border mode.
+    if start - halo >= 0 and stop + halo <= height:
+        return buffer[start - halo - buffer_start:stop + halo - buffer_start]
+    
+    rows = border_index(height, halo, border)[start:stop + 2 * halo]
+    band = np.take(buffer, np.maximum(rows - buffer_start, 0), axis=0)
+    band[rows < 0] = border_value
+    return band
+
+
+def stream_stage(strips, fn, halo, height, border=DEFAULT_BORDER, border_value=0):
+    # Applies a neighbourhood operation to a stream of consecutive row strips,
+    # holding back at most `halo` rows of look-ahead so every output row sees
+    # the same neighbourhood (and the same border rows) as a whole-image call
+    # of fn with this border mode. 'wrap' would need the far edge of the
+    # image before the first rows could be written, so it cannot stream.
+    check_border(border)
+    if border == 'wrap' and halo:
+        raise ValueError("The 'wrap' border cannot be streamed")
+    return _stream_rows(strips, fn, halo, height, border, border_value)
+
+
+def _stream_rows(strips, fn, halo, height, border, border_value):
+    buffer = None
+    buffer_start = 0
+    next_row = 0
+    
+    for strip in strips:
+        buffer = strip if buffer is None else np.concatenate([buffer, strip], axis=0)
+        available = buffer_start + len(buffer)
+        ready = height if available >= height else available - halo
+        
+        if ready > next_row:
+            band = _rows_with_halo(buffer, buffer_start, height, next_row, ready, halo,
+                                   border, border_value)
+            yield fn(band)[halo:halo + ready - next_row]
+            next_row = ready
+            
+            keep_from = max(next_row - halo, 0)
+            if keep_from > buffer_start:
+                buffer = buffer[keep_from - buffer_start:]
+                buffer_start = keep_from
+
+
+def stream_pipeline(source, stages, strip_rows=256):
+    # stages: (fn, halo) or (fn, halo, border[, border_value]) tuples; the
+    # border must be the one fn itself uses.
+    height = source.shape[0]
+    strips = read_strips(source, strip_rows)
+    for fn, halo, *border in stages:
+        strips = stream_stage(strips, fn, halo, height, *border)
+    return strips
+
+
+def stream_filter(input_path, output_path, stages, strip_rows=256, shape=None,
+                  dtype=np.uint8, offset=0):
+    source = open_image_source(input_path, shape, dtype, offset)
+    height = source.shape[0]
+    
+    sink = None
+    row = 0
+    for strip in stream_pipeline(source, stages, strip_rows):
+        if sink is None:
+            sink = open_image_sink(output_path, (height,) + strip.shape[1:], strip.dtype)
+        sink[row:row + len(strip)] = strip
+        row += len(strip)
+        if hasattr(sink, 'flush'):
+            sink.flush()
+    
+    return sink
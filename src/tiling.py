@@ -0,0 +1,111 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from src.borders import DEFAULT_BORDER, border_index
+
+
+def resolve_workers(workers):
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _pool(executor, workers):
+    if executor == 'thread':
+        return ThreadPoolExecutor(max_workers=workers)
+    if executor == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError(f"Unknown executor: {executor}")
+
+
+def row_bands(h, count):
+    count = max(1, min(count, h))
+    edges = np.linspace(0, h, count + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def band_with_halo(img, start, stop, halo, border=DEFAULT_BORDER, border_value=0):
+    # Rows [start, stop) plus halo rows on each side. Halo rows come from the
+    # neighbouring bands; only past the real top/bottom edge are they taken
+    # through the border mode, which reproduces the rows pad_border would add.
+    # Rows are the second-to-last axis, so (N, H, W) stacks split the same way.
+    h = img.shape[-2]
+    if start - halo >= 0 and stop + halo <= h:
+        return img[..., start - halo:stop + halo, :]
+    
+    rows = border_index(h, halo, border)[start:stop + 2 * halo]
+    band = np.take(img, np.maximum(rows, 0), axis=-2)
+    band[..., rows < 0, :] = border_value
+    return band
+
+
+def _crop_rows(result, halo, rows):
+    if isinstance(result, dict):
+        return {name: value[..., halo:halo + rows, :] for name, value in result.items()}
+    return result[..., halo:halo + rows, :]
+
+
+def _stitch(parts):
+    if isinstance(parts[0], dict):
+        return {name: np.concatenate([part[name] for part in parts], axis=-2) for name in parts[0]}
+    return np.concatenate(parts, axis=-2)
+
+
+def _shared_band(fn, ref, start, stop, halo, border, border_value):
+    # Process worker: reads its band straight from the shared image and
+    # returns the cropped result through shared memory as well.
+    from src.shared import attached, share
+    with attached(ref) as img:
+        band = band_with_halo(img, start, stop, halo, border, border_value)
+        result = share(_crop_rows(fn(band), halo, stop - start))
+        del band
+    return result
+
+
+def _run_tiled_shared(fn, img, halo, bands, workers, border, border_value):
+    # The image goes to the workers once through shared memory rather than
+    # pickled band by band, and results come back the same way.
+    from src.shared import SharedImageStore, adopt, release
+    with SharedImageStore() as store, ProcessPoolExecutor(max_workers=workers) as pool:
+        ref = store.put(img)
+        futures = [pool.submit(_shared_band, fn, ref, start, stop, halo, border, border_value)
+                   for start, stop in bands]
+        refs = [future.result() for future in futures]
+        result = _stitch([adopt(store, part) for part in refs])
+        for part in refs:
+            release(store, part)
+    return result
+
+
+def run_tiled(fn, img, halo, workers=None, executor='thread', border=DEFAULT_BORDER, border_value=0):
+    workers = resolve_workers(workers)
+    h = img.shape[-2]
+    
+    if workers == 1 or h <= max(halo, 1):
+        return fn(img)
+    
+    bands = row_bands(h, workers)
+    if executor == 'process':
+        return _run_tiled_shared(fn, img, halo, bands, workers, border, border_value)
+    
+    with _pool(executor, workers) as pool:
+        futures = [pool.submit(fn, band_with_halo(img, start, stop, halo, border, border_value))
+                   for start, stop in bands]
+        parts = [_crop_rows(future.result(), halo, stop - start)
+                 for future, (start, stop) in zip(futures, bands)]
+    
+    return _stitch(parts)
+
+
+def map_row_bands(fn, h, workers=None, executor='thread'):
+    workers = resolve_workers(workers)
+    
+    if workers == 1:
+        return fn(0, h)
+    
+    bands = row_bands(h, workers)
+    with _pool(executor, workers) as pool:
+        futures = [pool.submit(fn, start, stop) for start, stop in bands]
+        parts = [future.result() for future in futures]
+    
+    return np.concatenate(parts, axis=0)
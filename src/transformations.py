@@ -1,30 +1,90 @@
 import numpy as np
-from pathlib import Path
-import sys
-sys.path.append(str(Path(__file__).parent.parent))
+from functools import lru_cache
+from src.workspace import into
 
+LUT_INPUT = np.arange(256, dtype=np.uint8)
 
-def image_negative(img):
+
+def _as_lut(values):
+    lut = np.ascontiguousarray(values, dtype=np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+# Gathering through a LUT converts the indices to intp first; with out= the
+# image is mapped in blocks so that temporary stays small.
+LUT_BLOCK = 1 << 14
+
+
+def _apply_lut(lut, img, out=None):
+    if out is None:
+        return lut[img]
+    if not (img.flags.c_contiguous and out.flags.c_contiguous):
+        out[...] = lut[img]
+        return out
+    
+    flat_img, flat_out = img.reshape(-1), out.reshape(-1)
+    for start in range(0, flat_img.size, LUT_BLOCK):
+        np.take(lut, flat_img[start:start + LUT_BLOCK], out=flat_out[start:start + LUT_BLOCK])
+    return out
+
+
+def _negative(img):
     negative = 255 - img.astype(np.float32)
     return np.clip(negative, 0, 255).astype(np.uint8)
 
 
-def log_transformation(img, c=None):
-    img_float = img.astype(np.float32)
-    
+@lru_cache(maxsize=1)
+def negative_lut():
+    return _as_lut(_negative(LUT_INPUT))
+
+
+def image_negative(img, out=None):
+    if img.dtype == np.uint8:
+        return _apply_lut(negative_lut(), img, out)
+    return into(out, _negative(img))
+
+
+def _log(img, c):
+    log_img = c * np.log(1 + img.astype(np.float32))
+    return np.clip(log_img, 0, 255).astype(np.uint8)
+
+
+def default_log_constant(img):
+    return 255.0 / np.log(1 + np.float32(np.max(img)))
+
+
+@lru_cache(maxsize=256)
+def log_lut(c):
+    return _as_lut(_log(LUT_INPUT, c))
+
+
+def log_transformation(img, c=None, out=None):
     if c is None:
-        c = 255.0 / np.log(1 + np.max(img_float))
+        c = default_log_constant(img)
     
-    log_img = c * np.log(1 + img_float)
-    return np.clip(log_img, 0, 255).astype(np.uint8)
+    if img.dtype == np.uint8:
+        return _apply_lut(log_lut(c), img, out)
+    return into(out, _log(img, c))
 
 
-def gamma_correction(img, gamma=1.0):
+def _gamma(img, gamma):
     normalized = img.astype(np.float32) / 255.0
     corrected = np.power(normalized, gamma)
     return (corrected * 255.0).astype(np.uint8)
 
 
+@lru_cache(maxsize=256)
+def gamma_lut(gamma=1.0):
+    return _as_lut(_gamma(LUT_INPUT, float(gamma)))
+
+
+def gamma_correction(img, gamma=1.0, out=None):
+    if img.dtype == np.uint8:
+        return _apply_lut(gamma_lut(float(gamma)), img, out)
+    return into(out, _gamma(img, gamma))
+
+
 def bit_plane_slicing(img):
     bit_planes = []
     for k in range(8):
@@ -33,7 +93,7 @@ def bit_plane_slicing(img):
     return bit_planes
 
 
-def contrast_stretching(img, r1=None, s1=None, r2=None, s2=None):
+def default_stretch_points(img, r1=None, s1=None, r2=None, s2=None):
     if r1 is None or r2 is None:
         r1 = np.percentile(img, 5)
         r2 = np.percentile(img, 95)
@@ -43,6 +103,10 @@ def contrast_stretching(img, r1=None, s1=None, r2=None, s2=None):
     if s2 is None:
         s2 = 255
     
+    return np.float64(r1), np.float64(s1), np.float64(r2), np.float64(s2)
+
+
+def _contrast_stretch(img, r1, s1, r2, s2):
     result = np.zeros_like(img, dtype=np.float32)
     
     mask1 = img < r1
@@ -55,3 +119,17 @@ def contrast_stretching(img, r1=None, s1=None, r2=None, s2=None):
     result[mask3] = ((255 - s2) / (255 - r2)) * (img[mask3] - r2) + s2
     
     return np.clip(result, 0, 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=256)
+def contrast_stretching_lut(r1, s1, r2, s2):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _as_lut(_contrast_stretch(LUT_INPUT, *default_stretch_points(None, r1, s1, r2, s2)))
+
+
+def contrast_stretching(img, r1=None, s1=None, r2=None, s2=None, out=None):
+    points = default_stretch_points(img, r1, s1, r2, s2)
+    
+    if img.dtype == np.uint8:
+        return _apply_lut(contrast_stretching_lut(*points), img, out)
+    return into(out, _contrast_stretch(img, *points))
@@ -1,34 +1,70 @@
 import numpy as np
-import cv2
-import matplotlib.pyplot as plt
-from pathlib import Path
-import sys
-sys.path.append(str(Path(__file__).parent.parent))
-from config import IMAGES_DIR, RESULTS_DIR, DPI
+from functools import partial
+from config import (
+    IMAGES_DIR, RESULTS_DIR, DPI, IMAGE_CACHE_MAX_BYTES, SPECTRUM_CACHE_MAX_BYTES
+)
+from src.cache import ResultCache
+from src.tiling import run_tiled
+from src.borders import (
+    BORDER_MODES, DEFAULT_BORDER, check_border, pad_border, border_regions
+)
+from src.workspace import scratch, output, into
 
 
-def load_image(filename, grayscale=True):
+# Decoded images keyed by (path, mode, mtime, size), so loading an unchanged
+# file again skips the decode. The cached arrays are read-only; load_image
+# hands out copies, which still costs far less than decoding.
+image_cache = ResultCache(IMAGE_CACHE_MAX_BYTES)
+
+
+def _decode_image(filepath, grayscale):
+    import cv2
+    if grayscale:
+        return cv2.imread(str(filepath), cv2.IMREAD_GRAYSCALE)
+    
+    img = cv2.imread(str(filepath), cv2.IMREAD_COLOR)
+    return None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def _cached_image(filename, grayscale=True):
+    # The shared read-only decoded image, or None if it cannot be read.
     filepath = IMAGES_DIR / filename
     
     if not filepath.exists():
         print(f"Warning: {filename} not found. Creating placeholder.")
-        return np.zeros((256, 256), dtype=np.uint8)
+        return None
     
-    if grayscale:
-        img = cv2.imread(str(filepath), cv2.IMREAD_GRAYSCALE)
-    else:
-        img = cv2.imread(str(filepath), cv2.IMREAD_COLOR)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    stat = filepath.stat()
+    key = (str(filepath.resolve()), grayscale, stat.st_mtime_ns, stat.st_size)
+    found, img = image_cache.get(key)
+    if found:
+        return img
+    
+    img = _decode_image(filepath, grayscale)
     
     if img is None:
         print(f"Warning: Could not load {filename}. Creating placeholder.")
-        return np.zeros((256, 256), dtype=np.uint8)
+        return None
     
-    return img
+    return image_cache.put(key, img)
 
 
-def save_image(img, filename):
+def load_image(filename, grayscale=True):
+    img = _cached_image(filename, grayscale)
+    if img is None:
+        return np.zeros((256, 256), dtype=np.uint8)
+    return img.copy()
+
+
+# Set by src.writer.headless(): while a ResultWriter is active, save_image
+# and the show_* functions hand their work to it instead of blocking.
+_writer = None
+
+
+def _write_image(img, filename):
+    import cv2
     filepath = RESULTS_DIR / filename
+    filepath.parent.mkdir(parents=True, exist_ok=True)
     
     if len(img.shape) == 2:
         cv2.imwrite(str(filepath), img)
@@ -39,10 +75,14 @@ def save_image(img, filename):
     print(f"Saved: {filename}")
 
 
-def show_comparison(original, processed, title_original="Original", 
-                   title_processed="Processed", figsize=(12, 5), 
-                   save_name=None):
-    fig, axes = plt.subplots(1, 2, figsize=figsize)
+def save_image(img, filename):
+    if _writer is not None:
+        return _writer.save_image(img, filename)
+    _write_image(img, filename)
+
+
+def _draw_comparison(fig, original, processed, title_original, title_processed):
+    axes = fig.subplots(1, 2)
     
     axes[0].imshow(original, cmap='gray' if len(original.shape) == 2 else None)
     axes[0].set_title(title_original, fontsize=12, fontweight='bold')
@@ -52,26 +92,13 @@ def show_comparison(original, processed, title_original="Original",
     axes[1].set_title(title_processed, fontsize=12, fontweight='bold')
     axes[1].axis('off')
     
-    plt.tight_layout()
-    
-    if save_name:
-        save_path = RESULTS_DIR / save_name
-        plt.savefig(save_path, dpi=DPI, bbox_inches='tight')
-        print(f"Saved figure: {save_name}")
-    
-    plt.show()
-    plt.close()
+    fig.tight_layout()
 
 
-def show_multiple_images(images, titles, grid_shape, figsize=(16, 8), 
-                        suptitle=None, save_name=None):
+def _draw_grid(fig, images, titles, grid_shape, suptitle):
     rows, cols = grid_shape
-    fig, axes = plt.subplots(rows, cols, figsize=figsize)
-    
-    if rows == 1 or cols == 1:
-        axes = axes.flatten()
-    else:
-        axes = axes.flatten()
+    axes = fig.subplots(rows, cols)
+    axes = np.asarray(axes).flatten()
     
     for idx, (img, title) in enumerate(zip(images, titles)):
         if idx < len(axes):
@@ -83,14 +110,64 @@ def show_multiple_images(images, titles, grid_shape, figsize=(16, 8),
         axes[idx].axis('off')
     
     if suptitle:
-        plt.suptitle(suptitle, fontsize=14, fontweight='bold', y=0.98)
+        fig.suptitle(suptitle, fontsize=14, fontweight='bold', y=0.98)
     
-    plt.tight_layout()
+    fig.tight_layout()
+
+
+def _save_figure(fig, save_name):
+    save_path = RESULTS_DIR / save_name
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(save_path, dpi=DPI, bbox_inches='tight')
+    print(f"Saved figure: {save_name}")
+
+
+def _write_comparison(save_name, figsize, *args):
+    # Renders off-screen with a bare Figure (no pyplot state), so it can run
+    # in a writer thread or process.
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    _draw_comparison(fig, *args)
+    _save_figure(fig, save_name)
+
+
+def _write_grid(save_name, figsize, *args):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    _draw_grid(fig, *args)
+    _save_figure(fig, save_name)
+
+
+def show_comparison(original, processed, title_original="Original", 
+                   title_processed="Processed", figsize=(12, 5), 
+                   save_name=None):
+    if _writer is not None:
+        return _writer.figure(_write_comparison, save_name, figsize,
+                              original, processed, title_original, title_processed)
+    
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=figsize)
+    _draw_comparison(fig, original, processed, title_original, title_processed)
+    
+    if save_name:
+        _save_figure(fig, save_name)
+    
+    plt.show()
+    plt.close()
+
+
+def show_multiple_images(images, titles, grid_shape, figsize=(16, 8), 
+                        suptitle=None, save_name=None):
+    if _writer is not None:
+        return _writer.figure(_write_grid, save_name, figsize,
+                              list(images), list(titles), grid_shape, suptitle)
+    
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=figsize)
+    _draw_grid(fig, images, titles, grid_shape, suptitle)
     
     if save_name:
-        save_path = RESULTS_DIR / save_name
-        plt.savefig(save_path, dpi=DPI, bbox_inches='tight')
-        print(f"Saved figure: {save_name}")
+        _save_figure(fig, save_name)
     
     plt.show()
     plt.close()
@@ -105,12 +182,275 @@ def normalize_for_display(img):
     return normalized.astype(np.uint8)
 
 
-def apply_convolution(img, kernel):
+def _tap_sum(img_padded, kernel, taps, out_shape, out=None, workspace=None, depth=0):
+    # Sums kernel-weighted shifted views in the same pairwise order numpy uses
+    # for np.sum over a float32 window, so results match the per-pixel loop.
+    h, w = out_shape[-2:]
+    n = len(taps)
+
+    def term(tap, out):
+        di, dj = tap
+        return np.multiply(img_padded[..., di:di+h, dj:dj+w], kernel[di, dj], out=out)
+    
+    if n < 8:
+        acc = output(out, out_shape, np.float32)
+        acc.fill(0)
+        tmp = scratch(workspace, 'tap_tmp', out_shape)
+        for tap in taps:
+            acc += term(tap, tmp)
+        return acc
+    
+    if n <= 128:
+        partials = [term(taps[0], output(out, out_shape, np.float32))]
+        partials += [term(tap, scratch(workspace, f'tap_partial{j}', out_shape))
+                     for j, tap in enumerate(taps[1:8], 1)]
+        tmp = scratch(workspace, 'tap_tmp', out_shape)
+        i = 8
+        while i < n - (n % 8):
+            for j in range(8):
+                partials[j] += term(taps[i + j], tmp)
+            i += 8
+        
+        partials[0] += partials[1]
+        partials[2] += partials[3]
+        partials[4] += partials[5]
+        partials[6] += partials[7]
+        partials[0] += partials[2]
+        partials[4] += partials[6]
+        acc = partials[0]
+        acc += partials[4]
+        
+        for tap in taps[i:]:
+            acc += term(tap, tmp)
+        return acc
+    
+    n2 = n // 2
+    n2 -= n2 % 8
+    acc = _tap_sum(img_padded, kernel, taps[:n2], out_shape, out, workspace, depth + 1)
+    acc += _tap_sum(img_padded, kernel, taps[n2:], out_shape,
+                    scratch(workspace, f'tap_half{depth}', out_shape), workspace, depth + 1)
+    return acc
+
+
+def pad_reflect(img, pad_y, pad_x=None, out=None):
+    return pad_border(img, pad_y, pad_x, 'reflect-101', out=out)
+
+
+def correlate_padded(img_padded, kernel, shape, out=None, workspace=None):
+    kernel = np.asarray(kernel, dtype=np.float32)
+    taps = [(di, dj) for di in range(kernel.shape[0]) for dj in range(kernel.shape[1])]
+    return _tap_sum(img_padded, kernel, taps, shape, out, workspace)
+
+
+def correlate_bordered(img, kernel, border=DEFAULT_BORDER, border_value=0, out=None, workspace=None):
+    # Same result as correlate_padded on the padded image, but the interior is
+    # read straight from img; only the border strips are gathered.
+    kernel = np.asarray(kernel, dtype=np.float32)
+    if not np.can_cast(img.dtype, np.float32):
+        img = img.astype(np.float32)
+    pad_y, pad_x = kernel.shape[0] // 2, kernel.shape[1] // 2
+    taps = [(di, dj) for di in range(kernel.shape[0]) for dj in range(kernel.shape[1])]
+    
+    result = output(out, img.shape, np.float32)
+    for rows, cols, block in border_regions(img, pad_y, pad_x, border, border_value, np.float32):
+        region = result[..., rows, cols]
+        _tap_sum(block, kernel, taps, region.shape, region, workspace)
+    return result
+
+
+def separate_kernel(kernel, tol=1e-6):
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim != 2:
+        return None
+    
+    singular = np.linalg.svd(kernel, compute_uv=False)
+    if singular[0] == 0 or (len(singular) > 1 and singular[1] > tol * singular[0]):
+        return None
+    
+    i, j = np.unravel_index(np.argmax(np.abs(kernel)), kernel.shape)
+    col = kernel[:, j] / kernel[i, j]
+    row = kernel[i, :]
+    return col.astype(np.float32), row.astype(np.float32)
+
+
+def apply_separable_convolution(img, col_kernel, row_kernel, out=None, workspace=None,
+                                border=DEFAULT_BORDER, border_value=0):
+    col_kernel = np.asarray(col_kernel, dtype=np.float32).reshape(-1, 1)
+    row_kernel = np.asarray(row_kernel, dtype=np.float32).reshape(1, -1)
+    
+    vertical = correlate_bordered(img, col_kernel, border, border_value,
+                                  scratch(workspace, 'vertical', img.shape), workspace)
+    if border == 'constant':
+        # Columns outside the image hold the vertical pass over a constant column.
+        constant = np.full(col_kernel.shape, border_value, dtype=np.float32)
+        border_value = correlate_padded(constant, col_kernel, (1, 1))[0, 0]
+    return correlate_bordered(vertical, row_kernel, border, border_value, out, workspace)
+
+
+def _next_fast_len(n):
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+# Kernel spectra are as large as the padded frame (about 68 MB at 4K), so
+# they are kept in a cache bounded by bytes rather than by count: a sweep
+# over many kernels evicts the oldest spectra instead of holding them all.
+spectrum_cache = ResultCache(SPECTRUM_CACHE_MAX_BYTES)
+
+
+def _kernel_spectrum(kernel, fft_shape):
+    key = (kernel.tobytes(), kernel.shape, fft_shape)
+    found, spectrum = spectrum_cache.get(key)
+    if found:
+        return spectrum
+    spectrum = np.fft.rfft2(kernel[::-1, ::-1].astype(np.float64), s=fft_shape)
+    return spectrum_cache.put(key, spectrum)
+
+
+def apply_fft_convolution(img, kernel, border=DEFAULT_BORDER, border_value=0):
+    kernel = np.ascontiguousarray(kernel, dtype=np.float32)
+    size = kernel.shape[0]
+    pad = size // 2
+    h, w = img.shape[-2:]
+    
+    img_padded = pad_border(img.astype(np.float64), pad, None, border, border_value)
+    fft_shape = tuple(_next_fast_len(n) for n in img_padded.shape[-2:])
+    spectrum = _kernel_spectrum(kernel, fft_shape)
+    
+    full = np.fft.irfft2(np.fft.rfft2(img_padded, s=fft_shape) * spectrum, s=fft_shape)
+    return full[..., size-1:size-1+h, size-1:size-1+w].astype(np.float32)
+
+
+# Cost of one forward+inverse FFT element per log2(n), in units of one
+# kernel tap applied to one pixel.
+FFT_COST_PER_ELEMENT = 2.0
+
+
+def plan_convolution(shape, kernel, factors=None):
+    kernel = np.asarray(kernel, dtype=np.float32)
+    size = kernel.shape[0]
+    pad = size // 2
+    h, w = shape[-2:]
+    
+    costs = {'direct': size * size * h * w}
+    
+    # factors=False marks a kernel already known not to be separable.
+    if factors is None and size > 1:
+        factors = separate_kernel(kernel)
+    if factors:
+        costs['separable'] = size * h * (w + 2 * pad) + size * h * w
+    
+    n = _next_fast_len(h + 2 * pad) * _next_fast_len(w + 2 * pad)
+    costs['fft'] = FFT_COST_PER_ELEMENT * n * max(np.log2(n), 1.0)
+    
+    return min(costs, key=costs.get), factors
+
+
+def apply_convolution(img, kernel, method='auto', factors=None, workers=1, executor='thread',
+                      out=None, workspace=None, border=DEFAULT_BORDER, border_value=0):
+    kernel = np.asarray(kernel, dtype=np.float32)
+    size = kernel.shape[0]
+    
+    if method not in ('auto', 'direct', 'separable', 'fft'):
+        raise ValueError(f"Unknown convolution method: {method}")
+    check_border(border)
+    
+    if method == 'auto':
+        method, factors = plan_convolution(img.shape, kernel, factors)
+    elif method == 'separable' and not factors:
+        factors = separate_kernel(kernel)
+        if factors is None:
+            raise ValueError("Kernel is not separable")
+    
+    # FFT rounding depends on the transform size, so only spatial methods are
+    # split into bands (their per-pixel arithmetic is independent of tiling).
+    if workers != 1 and method != 'fft':
+        band_fn = partial(apply_convolution, kernel=kernel, method=method, factors=factors,
+                          border=border, border_value=border_value)
+        return into(out, run_tiled(band_fn, img, size // 2, workers, executor, border, border_value))
+    
+    if method == 'separable':
+        return apply_separable_convolution(img, *factors, out=out, workspace=workspace,
+                                           border=border, border_value=border_value)
+    if method == 'fft':
+        return into(out, apply_fft_convolution(img, kernel, border, border_value))
+    
+    return correlate_bordered(img, kernel, border, border_value, out, workspace)
+
+
+def iter_window_histograms(img_padded, size, shape):
+    # Sliding column histograms for uint8 frames: one 256-bin histogram (plus
+    # a 16-bin coarse one) per padded column, slid down one row at a time by
+    # removing the row that leaves and adding the one that enters. Window
+    # coarse histograms come from a prefix sum over the columns, so their
+    # cost does not depend on size. Yields, for each output row, the coarse
+    # histogram of every size x size window and the per-column fine
+    # histograms as 16x16 blocks for window_fine_block.
+    h, w = shape
+    wp = img_padded.shape[1]
+    cols = np.arange(wp)
+    
+    fine = np.zeros((wp, 256), dtype=np.int32)
+    coarse = np.zeros((wp, 16), dtype=np.int32)
+    for i in range(size):
+        fine[cols, img_padded[i]] += 1
+        coarse[cols, img_padded[i] >> 4] += 1
+    
+    fine_blocks = fine.reshape(wp, 16, 16)
+    coarse_cdf = np.zeros((wp + 1, 16), dtype=np.int32)
+    
+    for i in range(h):
+        if i > 0:
+            leaving = img_padded[i - 1]
+            entering = img_padded[i + size - 1]
+            fine[cols, leaving] -= 1
+            fine[cols, entering] += 1
+            coarse[cols, leaving >> 4] -= 1
+            coarse[cols, entering >> 4] += 1
+        
+        np.cumsum(coarse, axis=0, out=coarse_cdf[1:])
+        yield coarse_cdf[size:size+w] - coarse_cdf[:w], fine_blocks
+
+
+# Widest window for which summing the columns beats a prefix sum (measured
+# crossover around 31 on 512-wide frames).
+WINDOW_SUM_MAX_SIZE = 25
+
+
+def window_fine_block(fine_blocks, coarse_bins, size, method='auto'):
+    # The 16 fine bins under each output's coarse bin, summed over its
+    # window's size columns. 'sum' adds the columns directly (size gathers
+    # per output); 'prefix' differences a prefix sum over the columns, which
+    # costs a fixed 256 adds per column whatever the window size.
+    if method == 'auto':
+        method = 'sum' if size <= WINDOW_SUM_MAX_SIZE else 'prefix'
+    out_cols = np.arange(len(coarse_bins))
+    if method == 'prefix':
+        prefix = np.zeros((len(fine_blocks) + 1,) + fine_blocks.shape[1:], dtype=fine_blocks.dtype)
+        np.cumsum(fine_blocks, axis=0, out=prefix[1:])
+        return prefix[out_cols + size, coarse_bins] - prefix[out_cols, coarse_bins]
+    if method != 'sum':
+        raise ValueError(f"Unknown window histogram method: {method}")
+    block = fine_blocks[out_cols, coarse_bins]
+    for k in range(1, size):
+        block += fine_blocks[out_cols + k, coarse_bins]
+    return block
+
+
+def apply_convolution_reference(img, kernel, border=DEFAULT_BORDER, border_value=0):
+    # Per-pixel loop over np.pad, kept to check the fast paths against.
     kernel = np.array(kernel, dtype=np.float32)
     size = kernel.shape[0]
     pad = size // 2
     
-    img_padded = np.pad(img.astype(np.float32), pad, mode='reflect')
+    kwargs = {'constant_values': border_value} if border == 'constant' else {}
+    img_padded = np.pad(img.astype(np.float32), pad, mode=BORDER_MODES[check_border(border)], **kwargs)
     h, w = img.shape
     result = np.zeros_like(img, dtype=np.float32)
     
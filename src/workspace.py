@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class Workspace:
+    # Scratch buffers reused across calls, keyed by (name, shape, dtype).
+    # A buffer is allocated the first time a combination is asked for, so
+    # processing a run of same-shaped frames allocates only on the first.
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.float32):
+        key = (name, tuple(shape), np.dtype(dtype))
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(key[1], dtype=key[2])
+            self._buffers[key] = buffer
+            self.allocations += 1
+        return buffer
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        self._buffers.clear()
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __repr__(self):
+        return f"Workspace({len(self._buffers)} buffers, {self.nbytes} bytes)"
+
+
+def scratch(workspace, name, shape, dtype=np.float32):
+    if workspace is None:
+        return np.empty(shape, dtype=dtype)
+    return workspace.get(name, shape, dtype)
+
+
+def output(out, shape, dtype):
+    # Results never live in workspace buffers: either the caller's out= or a
+    # fresh array.
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != tuple(shape):
+        raise ValueError(f"out has shape {out.shape}, expected {tuple(shape)}")
+    return out
+
+
+def into(out, result):
+    if out is None:
+        return result
+    np.copyto(out, result, casting='unsafe')
+    return out
@@ -0,0 +1,106 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from src import utils
+from src.tiling import _pool, resolve_workers
+
+
+class ResultWriter:
+    # Saves result images and renders figures on a background pool, so the
+    # compute stages never wait on PNG encoding, matplotlib or the disk. At
+    # most max_pending jobs are queued; submitting another blocks until one
+    # finishes, which bounds the memory held by pending results.
+    #
+    # Figures are rendered in worker processes by default (matplotlib holds
+    # the GIL); with figures=False only image writes remain, and cv2 encodes
+    # without the GIL, so threads are enough.
+    def __init__(self, workers=2, max_pending=8, figures=True, executor=None):
+        if executor is None:
+            executor = 'process' if figures else 'thread'
+        self.figures = figures
+        self.executor = executor
+        self._pool = _pool(executor, resolve_workers(workers))
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.written = 0
+        self.skipped = 0
+        self.errors = []
+
+    def _snapshot(self, img):
+        # Workers read the array after submit() returns (a process pool
+        # pickles it later, on its feeder thread), so anything the caller
+        # could still change, such as a reused out= buffer, is copied now.
+        # Only read-only arrays owning their data are safe to pass as is.
+        if isinstance(img, np.ndarray) and (img.flags.writeable or not img.flags.owndata):
+            return img.copy()
+        return img
+
+    def submit(self, name, fn, *args):
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self._finished(name, f))
+        return future
+
+    def _finished(self, name, future):
+        with self._lock:
+            self._pending.discard(future)
+            error = future.exception()
+            if error is None:
+                self.written += 1
+            else:
+                self.errors.append((name, error))
+                print(f"Warning: could not write {name}: {error}")
+        self._slots.release()
+
+    def save_image(self, img, filename):
+        return self.submit(filename, utils._write_image, self._snapshot(img), filename)
+
+    def figure(self, render, save_name, figsize, *args):
+        # Without a file name a headless figure has nowhere to go.
+        if not self.figures or not save_name:
+            self.skipped += 1
+            return None
+        args = [[self._snapshot(v) for v in a] if isinstance(a, list) else self._snapshot(a)
+                for a in args]
+        return self.submit(save_name, render, save_name, figsize, *args)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+@contextmanager
+def headless(workers=2, max_pending=8, figures=True, executor=None):
+    # Inside the block, save_image, show_comparison and show_multiple_images
+    # return immediately: images and figures are written in the background
+    # and never shown on screen. figures=False skips figure rendering
+    # entirely and writes only the result images. Leaving the block waits
+    # for every pending write.
+    writer = ResultWriter(workers, max_pending, figures, executor)
+    previous = utils._writer
+    utils._writer = writer
+    try:
+        yield writer
+    finally:
+        utils._writer = previous
+        writer.close()
@@ -0,0 +1,105 @@
+from functools import partial
+
+import numpy as np
+
+from src.cache import ResultCache, result_key, cached
+from src.filters import box_filter, image_derivatives
+from src.workspace import Workspace
+
+
+def random_image(shape=(32, 40), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape).astype(np.uint8)
+
+
+def test_hits_and_misses():
+    cache = ResultCache()
+    img = random_image()
+    first = cache.call(box_filter, img, 5)
+    second = cache.call(box_filter, img, size=5)
+    assert second is first
+    assert np.array_equal(first, box_filter(img, 5))
+    assert not first.flags.writeable
+    
+    cache.call(box_filter, img, 7)
+    cache.call(box_filter, random_image(seed=1), 5)
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 3
+
+
+def test_out_is_filled_on_hits():
+    cache = ResultCache()
+    img = random_image()
+    expected = box_filter(img, 5)
+    for _ in range(2):
+        out = np.zeros_like(img)
+        assert cache.call(box_filter, img, 5, out=out) is out
+        assert np.array_equal(out, expected)
+    assert cache.stats()['hits'] == 1
+    
+    out = {'gx': np.zeros(img.shape, np.float32)}
+    for _ in range(2):
+        out['gx'][...] = 0
+        result = cache.call(image_derivatives, img, ('gx',), out=out)
+        assert result['gx'] is out['gx']
+        assert np.array_equal(out['gx'], image_derivatives(img, ('gx',))['gx'])
+
+
+def test_out_and_workspace_are_not_keyed():
+    img = random_image()
+    workspace = Workspace()
+    key = result_key(box_filter, (img, 5))
+    assert result_key(box_filter, (img, 5), {'workspace': workspace}) == key
+    box_filter(img, 5, workspace=workspace)
+    assert result_key(box_filter, (img, 5), {'workspace': workspace}) == key
+    assert result_key(box_filter, (img, 5), {'out': np.ones_like(img)}) == key
+
+
+def test_anonymous_callables_do_not_collide():
+    cache = ResultCache()
+    img = np.ones((2, 2), np.float32)
+    assert cache.call(lambda x: x + 1, img)[0, 0] == 2
+    assert cache.call(lambda x: x * 3, img)[0, 0] == 3
+
+    def make(k):
+        return lambda x: x * k
+    assert cache.call(make(2), img)[0, 0] == 2
+    assert cache.call(make(5), img)[0, 0] == 5
+    assert result_key(partial(box_filter, size=5), (img,)) == result_key(box_filter, (img, 5))
+
+
+def test_caller_arrays_stay_writeable():
+    cache = ResultCache()
+    img = random_image()
+    out = np.empty_like(img)
+    cache.call(lambda x: x, img)
+    cache.call(box_filter, img, 3, out=out)
+    assert img.flags.writeable and out.flags.writeable
+
+
+def test_memory_bound_and_disk_tier(tmp_path):
+    img = random_image()
+    cache = ResultCache(max_bytes=2 * img.nbytes, directory=tmp_path)
+    for size in (3, 5, 7):
+        cache.call(box_filter, img, size)
+    assert cache.bytes <= cache.max_bytes
+    assert cache.stats()['evictions'] == 1
+    cache.call(lambda x: x + 1, img)
+    assert len(list(tmp_path.iterdir())) == 3
+    
+    fresh = ResultCache(directory=tmp_path)
+    assert np.array_equal(fresh.call(box_filter, img, 3), box_filter(img, 3))
+    assert fresh.stats()['disk_hits'] == 1
+
+
+def test_cached_decorator():
+    cache = ResultCache()
+    calls = []
+
+    @cached(cache=cache)
+    def double(x):
+        calls.append(1)
+        return x * 2
+    img = random_image()
+    double(img)
+    double(img)
+    assert len(calls) == 1
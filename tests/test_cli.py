@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from src.cli import main, output_paths, parse_pipeline, run_pipeline
+from src.filters import median_filter
+from src.transformations import gamma_correction
+
+
+def write_image(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(str(path), np.full((12, 16), value, dtype=np.uint8))
+
+
+def test_output_paths_mirror_input_directories(tmp_path):
+    paths = [str(tmp_path / 'in' / 'a' / 'x.jpg'), str(tmp_path / 'in' / 'b' / 'x.jpg'),
+             str(tmp_path / 'in' / 'a' / 'y.png')]
+    outputs = output_paths(paths, tmp_path / 'out')
+    assert outputs == [tmp_path / 'out' / 'a' / 'x.png', tmp_path / 'out' / 'b' / 'x.png',
+                       tmp_path / 'out' / 'a' / 'y.png']
+    assert output_paths([str(tmp_path / 'x.jpg')], 'o', '.tif') == [Path('o') / 'x.tif']
+
+
+def test_output_paths_reject_clashes(tmp_path):
+    paths = [str(tmp_path / 'a' / 'x.jpg'), str(tmp_path / 'a' / 'x.png')]
+    with pytest.raises(ValueError, match='overwrite'):
+        output_paths(paths, tmp_path / 'out')
+
+
+def test_parse_and_run_pipeline():
+    pipeline = parse_pipeline("median:size=3 | gamma:gamma=0.5")
+    assert pipeline == [('median', {'size': 3}), ('gamma', {'gamma': 0.5})]
+    img = np.random.default_rng(0).integers(0, 256, (20, 20)).astype(np.uint8)
+    assert np.array_equal(run_pipeline(img, pipeline), gamma_correction(median_filter(img, 3), 0.5))
+    for spec in ('', 'blur:size=3', 'median:3'):
+        with pytest.raises(ValueError):
+            parse_pipeline(spec)
+
+
+def test_main_writes_every_input(tmp_path):
+    write_image(tmp_path / 'in' / 'a' / 'x.png', 10)
+    write_image(tmp_path / 'in' / 'b' / 'x.png', 90)
+    write_image(tmp_path / 'in' / 'a' / 'sub' / 'y.png', 50)
+    (tmp_path / 'in' / 'empty.d').mkdir()
+    
+    status = main([str(tmp_path / 'in' / '**'), '--ops', 'gamma:gamma=1.0',
+                   '-o', str(tmp_path / 'out'), '-j', '2'])
+    assert status == 0
+    for name, value in [('a/x.png', 10), ('b/x.png', 90), ('a/sub/y.png', 50)]:
+        assert (cv2.imread(str(tmp_path / 'out' / name), cv2.IMREAD_GRAYSCALE) == value).all()
+
+
+def test_main_rejects_clashes_before_writing(tmp_path):
+    write_image(tmp_path / 'in' / 'x.png', 10)
+    write_image(tmp_path / 'in' / 'x.jpg', 20)
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / 'in' / '*'), '--ops', 'negative', '-o', str(tmp_path / 'out')])
+    assert not (tmp_path / 'out').exists()
@@ -0,0 +1,223 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from src.borders import BORDER_MODES, pad_border, border_regions
+from src.utils import (
+    apply_convolution, apply_convolution_reference, correlate_padded, correlate_bordered
+)
+from src.filters import (
+    box_filter, gaussian_filter, median_filter, laplacian_filter, sobel_gradient, image_derivatives
+)
+from src.histogram import (
+    calculate_histogram, histogram_equalization, local_histogram_equalization,
+    histogram_matching, matching_lut
+)
+from src.transformations import gamma_correction
+from src import batch
+
+BORDERS = list(BORDER_MODES)
+
+
+def random_image(shape=(23, 31), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape).astype(np.uint8)
+
+
+def np_pad(img, pad, border, border_value=0):
+    kwargs = {'constant_values': border_value} if border == 'constant' else {}
+    return np.pad(img, pad, mode=BORDER_MODES[border], **kwargs)
+
+
+# Per-pixel loops as the functions were first written, on np.pad borders.
+
+def median_reference(img, size, border='reflect-101', border_value=0):
+    img_padded = np_pad(img, size // 2, border, border_value)
+    result = np.zeros_like(img)
+    for i in range(img.shape[0]):
+        for j in range(img.shape[1]):
+            result[i, j] = np.median(img_padded[i:i+size, j:j+size])
+    return result
+
+
+def local_equalization_reference(img, window_size, border='reflect-101', border_value=0):
+    img_padded = np_pad(img, window_size // 2, border, border_value)
+    result = np.zeros_like(img)
+    for i in range(img.shape[0]):
+        for j in range(img.shape[1]):
+            window = img_padded[i:i+window_size, j:j+window_size]
+            cdf = np.histogram(window.flatten(), bins=256, range=[0, 256])[0].cumsum()
+            result[i, j] = (cdf / cdf[-1])[img[i, j]] * 255
+    return result
+
+
+def matching_reference(img, target_hist):
+    src_cdf = calculate_histogram(img).cumsum()
+    src_cdf = src_cdf / src_cdf[-1]
+    target_cdf = target_hist.cumsum()
+    target_cdf = target_cdf / target_cdf[-1]
+    mapping = np.array([np.argmin(np.abs(target_cdf - src_cdf[i])) for i in range(256)],
+                       dtype=np.uint8)
+    return mapping[img]
+
+
+@pytest.mark.parametrize('border', BORDERS)
+@pytest.mark.parametrize('shape', [(23, 31), (3, 40), (1, 1)])
+def test_pad_border_matches_np_pad(border, shape):
+    img = random_image(shape)
+    for pad_y, pad_x in [(1, 1), (2, 3), (5, 4)]:
+        expected = np.pad(img, ((pad_y, pad_y), (pad_x, pad_x)), mode=BORDER_MODES[border],
+                          **({'constant_values': 7} if border == 'constant' else {}))
+        out = np.empty_like(expected)
+        assert np.array_equal(pad_border(img, pad_y, pad_x, border, 7), expected)
+        assert np.array_equal(pad_border(img, pad_y, pad_x, border, 7, out=out), expected)
+
+
+@pytest.mark.parametrize('border', BORDERS)
+def test_border_regions_cover_the_padded_image(border):
+    img = random_image()
+    kernel = np.random.default_rng(1).standard_normal((5, 5)).astype(np.float32)
+    expected = correlate_padded(np_pad(img, 2, border, 9).astype(np.float32), kernel, img.shape)
+    assert np.array_equal(correlate_bordered(img, kernel, border, 9), expected)
+    
+    covered = np.zeros(img.shape, dtype=int)
+    for rows, cols, _ in border_regions(img, 2, 2, border, 9):
+        covered[rows, cols] += 1
+    assert (covered == 1).all()
+
+
+@pytest.mark.parametrize('border', BORDERS)
+@pytest.mark.parametrize('size', [1, 3, 5, 9])
+def test_direct_convolution_matches_reference(border, size):
+    img = random_image()
+    kernel = np.random.default_rng(size).standard_normal((size, size)).astype(np.float32)
+    expected = apply_convolution_reference(img, kernel, border, 5)
+    result = apply_convolution(img, kernel, method='direct', border=border, border_value=5)
+    assert np.array_equal(result, expected)
+
+
+@pytest.mark.parametrize('method', ['separable', 'fft'])
+@pytest.mark.parametrize('border', BORDERS)
+def test_separable_and_fft_convolution_match_reference(method, border):
+    img = random_image()
+    factor = np.array([1, 4, 6, 4, 1], dtype=np.float32) / 16
+    kernel = np.outer(factor, factor)
+    expected = apply_convolution_reference(img, kernel, border, 5)
+    result = apply_convolution(img, kernel, method=method, border=border, border_value=5)
+    np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-3)
+
+
+@pytest.mark.parametrize('method', ['network', 'histogram', 'sort'])
+@pytest.mark.parametrize('size', [3, 5, 7])
+def test_median_matches_reference(method, size):
+    img = random_image()
+    assert np.array_equal(median_filter(img, size, method), median_reference(img, size))
+
+
+def test_sort_median_in_row_blocks(monkeypatch):
+    # A budget of a few rows of windows still gives the whole-frame result.
+    import src.filters
+    img = np.random.default_rng(3).random((23, 31)).astype(np.float32)
+    expected = median_filter(img, 4)
+    monkeypatch.setattr(src.filters, 'SORT_MEDIAN_BLOCK_BYTES', 31 * 16 * 4 * 3)
+    assert np.array_equal(median_filter(img, 4), expected)
+    assert np.array_equal(median_filter(img, 5), median_reference(img, 5))
+
+
+@pytest.mark.parametrize('border', BORDERS)
+def test_median_borders_match_reference(border):
+    img = random_image()
+    expected = median_reference(img, 5, border, 11)
+    assert np.array_equal(median_filter(img, 5, border=border, border_value=11), expected)
+
+
+@pytest.mark.parametrize('method', ['compare', 'histogram'])
+@pytest.mark.parametrize('window_size', [3, 7])
+@pytest.mark.parametrize('border', ['reflect-101', 'constant'])
+def test_local_equalization_matches_reference(method, window_size, border):
+    img = random_image()
+    expected = local_equalization_reference(img, window_size, border, 3)
+    result = local_histogram_equalization(img, window_size, method, border=border, border_value=3)
+    assert np.array_equal(result, expected)
+
+
+def test_histogram_matching_matches_reference():
+    rng = np.random.default_rng(2)
+    for seed in range(5):
+        img = random_image((40, 50), seed)
+        reference = (rng.beta(2, 5, (30, 30)) * 255).astype(np.uint8)
+        target_hist = calculate_histogram(reference)
+        expected = matching_reference(img, target_hist)
+        assert np.array_equal(histogram_matching(img, target_hist), expected)
+        assert np.array_equal(histogram_matching(img, reference=reference), expected)
+    
+    # Ties and empty target levels.
+    flat = np.zeros(256, dtype=np.int64)
+    flat[[0, 10, 10, 255]] = [5, 3, 3, 5]
+    img = random_image()
+    assert np.array_equal(matching_lut(calculate_histogram(img), flat)[img],
+                          matching_reference(img, flat))
+
+
+TILED = {
+    'convolution': partial(apply_convolution, kernel=np.ones((5, 5), np.float32) / 25,
+                           method='direct'),
+    'box': partial(box_filter, size=5),
+    'gaussian': partial(gaussian_filter, size=7, sigma=1.5),
+    'median': partial(median_filter, size=5),
+    'laplacian': laplacian_filter,
+    'sobel': sobel_gradient,
+    'local_equalize': partial(local_histogram_equalization, window_size=5),
+}
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+@pytest.mark.parametrize('name', list(TILED))
+def test_tiled_matches_single(name, executor):
+    img = random_image((97, 41))
+    fn = TILED[name]
+    for border in ('reflect-101', 'constant'):
+        expected = fn(img, border=border, border_value=4)
+        result = fn(img, workers=3, executor=executor, border=border, border_value=4)
+        assert np.array_equal(result, expected)
+
+
+def test_tiled_derivatives_match_single():
+    img = random_image((97, 41))
+    expected = image_derivatives(img)
+    result = image_derivatives(img, workers=3)
+    for name in expected:
+        assert np.array_equal(result[name], expected[name])
+
+
+def test_derivatives_match_separate_filters():
+    img = random_image()
+    result = image_derivatives(img, ('magnitude', 'laplacian'))
+    assert np.array_equal(result['magnitude'], sobel_gradient(img))
+    assert np.array_equal(result['laplacian'], laplacian_filter(img))
+
+
+BATCHED = [
+    (batch.image_negative_batch, lambda img: 255 - img),
+    (partial(batch.gamma_correction_batch, gamma=0.5), partial(gamma_correction, gamma=0.5)),
+    (lambda s: batch.histogram_equalization_batch(s)[0],
+     lambda img: histogram_equalization(img)[0]),
+    (partial(batch.apply_convolution_batch, kernel=np.ones((3, 3), np.float32) / 9),
+     partial(apply_convolution, kernel=np.ones((3, 3), np.float32) / 9)),
+    (partial(batch.box_filter_batch, size=5), partial(box_filter, size=5)),
+    (partial(batch.gaussian_filter_batch, size=5, sigma=1.0),
+     partial(gaussian_filter, size=5, sigma=1.0)),
+    (partial(batch.median_filter_batch, size=3), partial(median_filter, size=3)),
+    (batch.laplacian_filter_batch, laplacian_filter),
+    (batch.sobel_gradient_batch, sobel_gradient),
+    (partial(batch.local_histogram_equalization_batch, window_size=5),
+     partial(local_histogram_equalization, window_size=5)),
+]
+
+
+@pytest.mark.parametrize('batched, single', BATCHED)
+def test_batched_matches_per_frame(batched, single):
+    frames = [random_image((19, 27), seed) for seed in range(3)]
+    result = batched(np.stack(frames))
+    for frame, out in zip(frames, result):
+        assert np.array_equal(out, single(frame))
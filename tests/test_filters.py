@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from src.filters import box_filter, integral_image
+
+
+def random_image(shape=(37, 45), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape).astype(np.uint8)
+
+
+def test_integral_image_reused_across_sizes():
+    img = random_image()
+    table = integral_image(img, pad=7)
+    for size in (1, 3, 5, 9, 15):
+        assert np.array_equal(box_filter(img, size, integral=table), box_filter(img, size))
+
+
+def test_integral_matches_separable():
+    img = random_image()
+    for size in (3, 7):
+        integral = box_filter(img, size, method='integral')
+        separable = box_filter(img, size, method='separable')
+        assert np.abs(integral.astype(int) - separable).max() <= 1
+
+
+def test_integral_with_other_border():
+    img = random_image()
+    table = integral_image(img, pad=2, border='constant', border_value=9)
+    assert np.array_equal(box_filter(img, 5, integral=table),
+                          box_filter(img, 5, method='integral', border='constant', border_value=9))
+
+
+def test_integral_table_too_small():
+    img = random_image()
+    with pytest.raises(ValueError):
+        box_filter(img, 7, integral=integral_image(img, pad=2))
+
+
+@pytest.mark.parametrize('options', [
+    {'border': 'constant'},
+    {'border_value': 3},
+    {'workers': 2},
+    {'method': 'separable'},
+])
+def test_integral_rejects_options_it_would_ignore(options):
+    img = random_image()
+    with pytest.raises(ValueError):
+        box_filter(img, 5, integral=integral_image(img, pad=2), **options)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.histogram import adaptive_histogram_equalization, calculate_histogram
+
+
+def random_image(shape=(64, 80), seed=0, low=0, high=256):
+    return np.random.default_rng(seed).integers(low, high, shape).astype(np.uint8)
+
+
+def tiles_reference(img, grid_size):
+    # The original per-tile loop, with nothing clipped.
+    h, w = img.shape
+    grid_h, grid_w = grid_size
+    tile_h, tile_w = h // grid_h, w // grid_w
+    result = np.zeros_like(img)
+    for i in range(grid_h):
+        for j in range(grid_w):
+            y0, x0 = i * tile_h, j * tile_w
+            y1 = (i + 1) * tile_h if i < grid_h - 1 else h
+            x1 = (j + 1) * tile_w if j < grid_w - 1 else w
+            tile = img[y0:y1, x0:x1]
+            cdf = calculate_histogram(tile).cumsum()
+            result[y0:y1, x0:x1] = (cdf / cdf[-1] * 255)[tile].astype(np.uint8)
+    return result
+
+
+@pytest.mark.parametrize('grid_size', [(1, 1), (4, 4), (8, 8), (3, 5)])
+def test_unclipped_tiles_match_per_tile_equalization(grid_size):
+    img = random_image()
+    result = adaptive_histogram_equalization(img, clip_limit=1e9, grid_size=grid_size, method='tiles')
+    assert np.abs(result.astype(int) - tiles_reference(img, grid_size)).max() <= 1
+
+
+def test_single_tile_needs_no_blending():
+    img = random_image()
+    for clip_limit in (1.5, 4.0):
+        assert np.array_equal(
+            adaptive_histogram_equalization(img, clip_limit, (1, 1)),
+            adaptive_histogram_equalization(img, clip_limit, (1, 1), method='tiles'))
+
+
+@pytest.mark.parametrize('shape', [(5, 64), (64, 3), (2, 2)])
+def test_grid_larger_than_image(shape):
+    # Rows or columns short of the grid get one tile each, never empty ones.
+    img = random_image(shape, low=80, high=110)
+    result = adaptive_histogram_equalization(img)
+    clamped = adaptive_histogram_equalization(img, grid_size=(min(8, shape[0]), min(8, shape[1])))
+    assert np.array_equal(result, clamped)
+    
+    # Every tile of a flat image has the same LUT, so the blend is flat too.
+    flat = adaptive_histogram_equalization(np.full(shape, 100, dtype=np.uint8))
+    assert (flat == flat[0, 0]).all()
+
+
+def test_clahe_is_bounded_and_tiles_agree_at_centres():
+    img = random_image((64, 64))
+    blended = adaptive_histogram_equalization(img, 2.0, (4, 4))
+    tiles = adaptive_histogram_equalization(img, 2.0, (4, 4), method='tiles')
+    # Tiles are 16 pixels wide; the pixels around each centre lean almost
+    # entirely on that tile's LUT.
+    centres = np.ix_([7, 8, 23, 24, 39, 40, 55, 56], [7, 8, 23, 24, 39, 40, 55, 56])
+    assert np.abs(blended[centres].astype(int) - tiles[centres]).max() <= 8
+    assert blended.dtype == np.uint8
+
+
+def test_clahe_workers_match_single():
+    img = random_image((97, 61))
+    expected = adaptive_histogram_equalization(img)
+    assert np.array_equal(adaptive_histogram_equalization(img, workers=3), expected)
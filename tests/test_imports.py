@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def loaded_after(statement):
+    # A fresh interpreter, so nothing imported by other tests leaks in.
+    probe = (f"import sys\n{statement}\n"
+             "print(' '.join(sorted(m for m in ('cv2', 'matplotlib', 'src.filters', 'src.utils') "
+             "if m in sys.modules)))")
+    result = subprocess.run([sys.executable, '-c', probe], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True)
+    lines = result.stdout.splitlines()
+    return lines[-1].split() if lines else []
+
+
+def test_import_src_loads_nothing_heavy():
+    assert loaded_after("import src") == []
+
+
+@pytest.mark.parametrize('statement', [
+    "from src import box_filter, median_filter, histogram_equalization, gamma_correction",
+    "from src.filters import gaussian_filter; from src.utils import apply_convolution",
+    "from src import Pipeline, ResultCache, SharedImageStore",
+])
+def test_compute_functions_do_not_load_cv2_or_matplotlib(statement):
+    loaded = loaded_after(statement)
+    assert 'cv2' not in loaded and 'matplotlib' not in loaded
+
+
+def test_exports_load_their_submodule_on_first_use():
+    loaded = loaded_after("import src; src.median_filter")
+    assert 'src.filters' in loaded and 'cv2' not in loaded
+    # Decoding is what needs cv2; a missing file does not get that far.
+    assert 'cv2' not in loaded_after("import src; src.load_image('missing.png')")
+    assert 'cv2' in loaded_after("import src; src.load_image('Fig0304(a)(breast_digital_Xray)_1.jpg')")
+
+
+def test_every_export_resolves():
+    import src
+    for name in src.__all__:
+        assert getattr(src, name) is not None
+    assert set(src.__all__) <= set(dir(src))
+    with pytest.raises(AttributeError):
+        src.no_such_function
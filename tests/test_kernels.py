@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from config import LAPLACIAN_KERNEL, SOBEL_X_KERNEL, SOBEL_Y_KERNEL
+from src.filters import box_kernel_1d, gaussian_kernel, gaussian_kernel_1d, gaussian_filter
+from src.kernels import KERNEL_TYPES, get_kernel
+from src.utils import apply_convolution
+
+
+def test_kernels_are_built_once_and_read_only():
+    for kind in KERNEL_TYPES:
+        sigma = 1.0 if kind == 'gaussian' else None
+        kernel = get_kernel(kind, 5, sigma)
+        assert get_kernel(kind, 5, sigma) is kernel
+        assert not kernel.kernel.flags.writeable
+        assert kernel.kernel.dtype == np.float32
+        with pytest.raises(ValueError):
+            kernel.kernel[0, 0] = 1
+
+
+def test_factors_multiply_out_to_the_kernel():
+    for kind, size in [('box', 5), ('gaussian', 7), ('sobel_x', 3), ('sobel_y', 3)]:
+        kernel = get_kernel(kind, size, 1.5)
+        col, row = kernel.factors
+        assert np.allclose(np.outer(col, row), kernel.kernel)
+    assert get_kernel('laplacian').factors is False
+
+
+def test_fixed_kernels_come_from_config():
+    assert np.array_equal(get_kernel('laplacian').kernel, LAPLACIAN_KERNEL)
+    assert np.array_equal(get_kernel('sobel_x', 7).kernel, SOBEL_X_KERNEL)
+    assert np.array_equal(get_kernel('sobel_y').kernel, SOBEL_Y_KERNEL)
+
+
+def test_gaussian_has_one_construction():
+    kernel = get_kernel('gaussian', 5, 1.0)
+    assert gaussian_kernel(5, 1.0) is kernel.kernel
+    assert gaussian_kernel_1d(5, 1.0) is kernel.factors[0]
+    assert np.isclose(kernel.kernel.sum(), 1.0)
+    assert np.isclose(box_kernel_1d(4).sum(), 1.0)
+    
+    img = np.random.default_rng(0).integers(0, 256, (20, 30)).astype(np.uint8)
+    expected = np.clip(apply_convolution(img, gaussian_kernel(5, 1.0), method='separable'), 0, 255)
+    assert np.array_equal(gaussian_filter(img, 5, 1.0), expected.astype(np.uint8))
+
+
+def test_invalid_kernels():
+    with pytest.raises(ValueError):
+        get_kernel('sharpen')
+    with pytest.raises(ValueError):
+        get_kernel('gaussian', 5)
@@ -0,0 +1,76 @@
+import weakref
+
+import numpy as np
+import pytest
+
+from src.filters import box_filter, median_filter, unsharp_masking
+from src.pipeline import Pipeline
+
+
+def random_image(shape=(30, 40), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape).astype(np.uint8)
+
+
+def test_identical_stages_are_merged():
+    p = Pipeline()
+    img = p.input('img')
+    a = p.add(box_filter, img, 5)
+    assert p.add(box_filter, img, size=5) is a
+    assert p.add(box_filter, img, 5, method='auto') is a
+    assert p.add(box_filter, img, 7) is not a
+    assert p.add(median_filter, a, 3) is p.add(median_filter, a, size=3)
+    assert len(p) == 4
+
+
+def test_each_stage_runs_once_and_only_when_needed():
+    calls = []
+
+    def counted(name, fn):
+        def stage(*args, **kwargs):
+            calls.append(name)
+            return fn(*args, **kwargs)
+        return stage
+    
+    blur = counted('blur', box_filter)
+    median = counted('median', median_filter)
+    p = Pipeline()
+    img = p.input('img')
+    shared = p.add(blur, img, 5)
+    first = p.add(median, shared, 3)
+    second = p.add(median, shared, 5)
+    p.add(median, img, 7)
+    
+    x = random_image()
+    result = p.run({'img': x}, {'first': first, 'second': second})
+    assert sorted(calls) == ['blur', 'median', 'median']
+    assert np.array_equal(result['first'], median_filter(box_filter(x, 5), 3))
+    assert np.array_equal(result['second'], median_filter(box_filter(x, 5), 5))
+
+
+def test_intermediates_are_dropped_after_their_last_consumer():
+    refs = {}
+
+    def produce(img):
+        value = img.astype(np.float32)
+        refs['intermediate'] = weakref.ref(value)
+        return value
+
+    def check_freed(img):
+        return refs['intermediate']() is None
+    
+    p = Pipeline()
+    img = p.input('img')
+    consumed = p.add(np.add, p.add(produce, img), 1)
+    later = p.add(check_freed, img)
+    result = p.run({'img': random_image()}, [consumed, later])
+    assert result['check_freed'] is True
+
+
+def test_tuple_outputs_and_missing_inputs():
+    p = Pipeline()
+    img = p.input('img')
+    stage = p.add(unsharp_masking, img, 5, 1.0)
+    x = random_image()
+    assert np.array_equal(p.run({'img': x}, stage[2]), unsharp_masking(x, 5, 1.0)[2])
+    with pytest.raises(ValueError):
+        p.run({}, stage[2])
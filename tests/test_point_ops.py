@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from src.histogram import (
+    calculate_histogram, histogram_equalization, histogram_matching, percentile_from_histogram
+)
+from src.point_ops import (
+    PointChain, lut_op, negative_op, log_op, gamma_op, contrast_stretching_op, equalization_op,
+    matching_op
+)
+from src.transformations import (
+    image_negative, log_transformation, gamma_correction, contrast_stretching
+)
+
+
+def random_image(shape=(48, 64), seed=0, low=0, high=256):
+    return np.random.default_rng(seed).integers(low, high, shape).astype(np.uint8)
+
+
+STEPS = {
+    'negative': (negative_op(), image_negative),
+    'log': (log_op(), log_transformation),
+    'log_c': (log_op(20.0), lambda img: log_transformation(img, 20.0)),
+    'gamma': (gamma_op(0.5), lambda img: gamma_correction(img, 0.5)),
+    'contrast': (contrast_stretching_op(), contrast_stretching),
+    'contrast_fixed': (contrast_stretching_op(50, 20, 180, 230),
+                       lambda img: contrast_stretching(img, 50, 20, 180, 230)),
+    'equalize': (equalization_op(), lambda img: histogram_equalization(img)[0]),
+}
+
+
+@pytest.mark.parametrize('names', [
+    ['negative', 'gamma'],
+    ['gamma', 'equalize'],
+    ['contrast', 'log', 'equalize'],
+    ['negative', 'contrast_fixed', 'log_c', 'contrast', 'gamma'],
+    ['equalize', 'negative', 'equalize'],
+])
+def test_chain_matches_calling_each_function(names):
+    for seed in range(3):
+        img = random_image(seed=seed, low=10 * seed, high=200)
+        expected = img
+        for name in names:
+            expected = STEPS[name][1](expected)
+        chain = PointChain([STEPS[name][0] for name in names])
+        assert np.array_equal(chain(img), expected)
+
+
+def test_matching_op_matches_histogram_matching():
+    img = random_image()
+    reference = random_image(seed=5, low=100, high=160)
+    target = calculate_histogram(reference)
+    chain = gamma_op(0.7) >> matching_op(target)
+    assert np.array_equal(chain(img), histogram_matching(gamma_correction(img, 0.7), target))
+
+
+def test_fixed_chain_compiles_to_one_lut():
+    chain = negative_op() >> gamma_op(2.0) >> lut_op(np.arange(256)[::-1], 'flip')
+    assert not chain.adaptive
+    compiled = chain.compile()
+    img = random_image()
+    assert np.array_equal(compiled.lut[img], chain(img))
+    assert not compiled.lut.flags.writeable
+    with pytest.raises(ValueError):
+        (negative_op() >> equalization_op()).compile()
+
+
+@pytest.mark.parametrize('q', [0, 1, 5, 37.5, 50, 95, 99.9, 100])
+def test_percentile_from_histogram_matches_np_percentile(q):
+    for seed, (low, high, count) in enumerate([(0, 256, 1000), (40, 60, 7), (3, 4, 5), (0, 256, 1)]):
+        pixels = np.random.default_rng(seed).integers(low, high, count).astype(np.uint8)
+        assert percentile_from_histogram(calculate_histogram(pixels), q) == np.percentile(pixels, q)
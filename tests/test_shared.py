@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+import pytest
+
+from src import utils
+from src.filters import box_filter, image_derivatives
+from src.shared import SharedImageStore, adopt, attached, release, share
+
+
+def random_image(shape=(60, 48), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape).astype(np.uint8)
+
+
+@pytest.fixture
+def images_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'IMAGES_DIR', tmp_path)
+    monkeypatch.setattr(utils, 'image_cache', utils.ResultCache(utils.IMAGE_CACHE_MAX_BYTES))
+    return tmp_path
+
+
+def test_load_image_decodes_once_and_hands_out_copies(images_dir):
+    img = random_image()
+    cv2.imwrite(str(images_dir / 'a.png'), img)
+    first = utils.load_image('a.png')
+    first[...] = 0
+    second = utils.load_image('a.png')
+    assert np.array_equal(second, img)
+    assert second.flags.writeable and second is not first
+    assert utils.image_cache.stats()['hits'] == 1
+    
+    colour = utils.load_image('a.png', grayscale=False)
+    assert colour.shape == img.shape + (3,)
+    assert utils.load_image('missing.png').shape == (256, 256)
+
+
+def test_changed_files_are_decoded_again(images_dir):
+    path = images_dir / 'a.png'
+    cv2.imwrite(str(path), random_image(seed=1))
+    utils.load_image('a.png')
+    replacement = random_image(seed=2)
+    cv2.imwrite(str(path), replacement)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert np.array_equal(utils.load_image('a.png'), replacement)
+
+
+def _filter_shared(ref, size):
+    with attached(ref) as img:
+        return share({'box': box_filter(img, size), 'shape': img.shape})
+
+
+def test_store_round_trip_through_worker_processes(images_dir):
+    img = random_image()
+    cv2.imwrite(str(images_dir / 'a.png'), img)
+    with SharedImageStore() as store, ProcessPoolExecutor(2) as pool:
+        ref = store.load('a.png')
+        assert store.load('a.png') == ref
+        assert np.array_equal(store.array(ref), img)
+        
+        handles = [pool.submit(_filter_shared, ref, size).result() for size in (3, 5)]
+        results = [adopt(store, handle) for handle in handles]
+        for size, result in zip((3, 5), results):
+            assert np.array_equal(result['box'], box_filter(img, size))
+            assert result['shape'] == img.shape
+        
+        names = [handles[0]['box'].name, handles[1]['box'].name]
+        release(store, handles[0])
+        assert len(store) == 2
+    
+    for name in names + [ref.name]:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_empty_buffers_are_filled_in_place():
+    with SharedImageStore() as store:
+        ref = store.empty((4, 5), np.float32)
+        with attached(ref) as view:
+            view[...] = 2.5
+        assert (store.array(ref) == 2.5).all()
+        assert store.nbytes >= 4 * 5 * 4
+
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason="needs /dev/shm to list blocks")
+def test_process_tiling_leaves_no_shared_blocks():
+    img = random_image((120, 50))
+    before = set(os.listdir('/dev/shm'))
+    result = image_derivatives(img, workers=3, executor='process')
+    expected = image_derivatives(img)
+    assert all(np.array_equal(result[name], expected[name]) for name in expected)
+    assert set(os.listdir('/dev/shm')) <= before
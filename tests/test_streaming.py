@@ -0,0 +1,67 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from src.filters import box_filter, gaussian_filter, median_filter
+from src.streaming import open_image_source, stream_filter, stream_pipeline
+
+
+def random_image(shape=(103, 47), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape).astype(np.uint8)
+
+
+def stages_for(border, border_value=0):
+    options = {'border': border, 'border_value': border_value}
+    return [
+        (partial(median_filter, size=5, **options), 2, border, border_value),
+        (partial(gaussian_filter, size=7, sigma=1.5, **options), 3, border, border_value),
+        (partial(box_filter, size=3, **options), 1, border, border_value),
+    ]
+
+
+def whole_image(img, stages):
+    for fn, *_ in stages:
+        img = fn(img)
+    return img
+
+
+@pytest.mark.parametrize('border', ['reflect-101', 'reflect', 'replicate', 'constant'])
+@pytest.mark.parametrize('strip_rows', [1, 2, 7, 64, 500])
+def test_stream_matches_whole_image(border, strip_rows):
+    img = random_image()
+    stages = stages_for(border, 13)
+    strips = list(stream_pipeline(img, stages, strip_rows))
+    assert np.array_equal(np.concatenate(strips), whole_image(img, stages))
+
+
+def test_stream_image_shorter_than_halo():
+    img = random_image((3, 20))
+    stages = stages_for('reflect-101')
+    assert np.array_equal(np.concatenate(list(stream_pipeline(img, stages, 1))),
+                          whole_image(img, stages))
+
+
+def test_stage_without_border_uses_default():
+    img = random_image()
+    fn = partial(median_filter, size=3)
+    assert np.array_equal(np.concatenate(list(stream_pipeline(img, [(fn, 1)], 10))), fn(img))
+
+
+def test_wrap_cannot_stream():
+    with pytest.raises(ValueError):
+        stream_pipeline(random_image(), [(box_filter, 1, 'wrap')])
+
+
+@pytest.mark.parametrize('suffix', ['.npy', '.raw'])
+def test_stream_filter_files(tmp_path, suffix):
+    img = random_image()
+    source = tmp_path / f'in{suffix}'
+    if suffix == '.npy':
+        np.save(source, img)
+    else:
+        img.tofile(source)
+    stages = stages_for('replicate')
+    stream_filter(source, tmp_path / f'out{suffix}', stages, strip_rows=16, shape=img.shape)
+    result = open_image_source(tmp_path / f'out{suffix}', img.shape)
+    assert np.array_equal(result, whole_image(img, stages))
@@ -0,0 +1,98 @@
+import tracemalloc
+from functools import partial
+
+import numpy as np
+import pytest
+
+from src.filters import (
+    box_filter, gaussian_filter, median_filter, laplacian_filter, sharpen_with_laplacian,
+    sobel_gradient, high_boost_filter, image_derivatives
+)
+from src.transformations import (
+    image_negative, gamma_correction, log_transformation, contrast_stretching
+)
+from src.workspace import Workspace, output
+
+FILTERS = {
+    'box_integral': partial(box_filter, size=5),
+    'box_separable': partial(box_filter, size=5, method='separable'),
+    'gaussian': partial(gaussian_filter, size=5, sigma=1.0),
+    'median_network': partial(median_filter, size=3),
+    'laplacian': laplacian_filter,
+    'sharpen': sharpen_with_laplacian,
+    'sobel': sobel_gradient,
+    'high_boost': high_boost_filter,
+}
+
+TRANSFORMS = {
+    'negative': image_negative,
+    'gamma': partial(gamma_correction, gamma=0.5),
+    'log': log_transformation,
+    'contrast': partial(contrast_stretching, r1=50, s1=20, r2=180, s2=230),
+}
+
+
+def frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (500, 800)).astype(np.uint8)
+
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('name', list(FILTERS))
+def test_repeat_filter_calls_reuse_the_workspace(name):
+    fn = FILTERS[name]
+    img = frame()
+    expected = fn(img)
+    workspace = Workspace()
+    out = np.empty_like(expected)
+    fn(frame(1), out=out, workspace=workspace)
+    allocations = workspace.allocations
+    
+    # Same-shaped frames after the first allocate no new buffers, and the
+    # temporaries stay far below one frame.
+    result, peak = peak_bytes(lambda: fn(img, out=out, workspace=workspace))
+    assert result is out
+    assert np.array_equal(out, expected)
+    assert workspace.allocations == allocations
+    assert peak < img.nbytes // 2
+
+
+@pytest.mark.parametrize('name', list(TRANSFORMS))
+def test_transforms_write_into_out(name):
+    fn = TRANSFORMS[name]
+    img = frame()
+    expected = fn(img)
+    out = np.empty_like(expected)
+    fn(img, out=out)
+    result, peak = peak_bytes(lambda: fn(img, out=out))
+    assert result is out
+    assert np.array_equal(out, expected)
+    assert peak < img.nbytes // 2
+
+
+def test_derivatives_out_dict():
+    img = frame()
+    expected = image_derivatives(img)
+    out = {name: np.empty(img.shape, np.float32) for name in expected}
+    result = image_derivatives(img, out=out, workspace=Workspace())
+    for name in expected:
+        assert result[name] is out[name]
+        assert np.array_equal(out[name], expected[name])
+
+
+def test_workspace_buffers_are_keyed_by_shape_and_dtype():
+    workspace = Workspace()
+    a = workspace.get('tmp', (4, 4))
+    assert workspace.get('tmp', (4, 4)) is a
+    assert workspace.get('tmp', (4, 5)) is not a
+    assert workspace.get('tmp', (4, 4), np.float64) is not a
+    assert workspace.allocations == 3
+    with pytest.raises(ValueError):
+        output(np.empty((2, 2)), (3, 3), np.float32)
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from src import utils
+from src.writer import ResultWriter, headless
+
+
+@pytest.fixture
+def results_dir(tmp_path, monkeypatch):
+    # Writers must never touch the real results directory.
+    monkeypatch.setattr(utils, 'RESULTS_DIR', tmp_path)
+    return tmp_path
+
+
+def read(path):
+    return cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_reused_buffer_is_written_as_it_was_at_save_time(results_dir, executor):
+    buffer = np.zeros((16, 16), np.uint8)
+    with headless(workers=1, figures=False, executor=executor) as writer:
+        for i in range(6):
+            buffer[...] = i * 40
+            utils.save_image(buffer, f'f{i}.png')
+            utils.save_image(buffer[::2], f'view{i}.png')
+    assert writer.written == 12 and not writer.errors
+    for i in range(6):
+        assert (read(results_dir / f'f{i}.png') == i * 40).all()
+        assert (read(results_dir / f'view{i}.png') == i * 40).all()
+
+
+def test_headless_figures(results_dir):
+    img = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    with headless(workers=1) as writer:
+        utils.show_comparison(img, 255 - img, save_name='figs/comparison.png')
+        utils.show_multiple_images([img, img, img], ['a', 'b', 'c'], (1, 3), save_name='grid.png')
+        utils.show_comparison(img, img)
+    assert writer.written == 2 and writer.skipped == 1
+    assert (results_dir / 'figs' / 'comparison.png').exists()
+    assert (results_dir / 'grid.png').exists()
+    
+    with headless(figures=False) as writer:
+        utils.show_comparison(img, img, save_name='skipped.png')
+    assert writer.skipped == 1 and not (results_dir / 'skipped.png').exists()
+    assert utils._writer is None
+
+
+def test_errors_are_collected_and_pending_is_bounded(results_dir):
+    with ResultWriter(workers=2, max_pending=2, figures=False) as writer:
+        futures = [writer.save_image(np.zeros((4, 4), np.uint8), f'{i}.png') for i in range(5)]
+        assert writer.pending <= 2
+        writer.save_image(np.zeros((4, 4), np.uint8), 'bad.unknown-extension')
+    assert all(future.done() for future in futures)
+    assert writer.written == 5
+    assert [name for name, _ in writer.errors] == ['bad.unknown-extension']